@@ -0,0 +1,283 @@
+"""Local stand-in for WeatherAPI (https://www.weatherapi.com/) used for benchmarks.
+
+Serves realistic current/forecast/history payloads with configurable latency
+and error rates. Point the backend at it with
+WEATHER_API_BASE_URL=http://127.0.0.1:9000/v1.
+
+Usage:
+    python fake_weatherapi.py --port 9000 --latency-ms 80 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+
+import uvicorn
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Fake WeatherAPI")
+
+# Behaviour, overridable from the command line or POST /__config
+CONFIG = {
+    "latency_ms": 50.0,
+    "jitter_ms": 20.0,
+    # Share of calls answered with 500 / 403 (quota exceeded)
+    "error_rate": 0.0,
+    "quota_rate": 0.0,
+}
+
+# Upstream calls received, by path
+CALLS = Counter()
+
+CONDITIONS = [
+    (1000, "Sunny", "Clear"),
+    (1003, "Partly cloudy", "Partly cloudy"),
+    (1006, "Cloudy", "Cloudy"),
+    (1063, "Patchy rain possible", "Patchy rain possible"),
+    (1183, "Light rain", "Light rain"),
+    (1195, "Heavy rain", "Heavy rain"),
+]
+COORDINATES = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+IP_ADDRESS = re.compile(r"^(auto:ip|[0-9.]+|[0-9a-fA-F]*:[0-9a-fA-F:]+)$")
+
+
+def _rng(*parts) -> random.Random:
+    seed = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=8).digest()
+    return random.Random(int.from_bytes(seed, "big"))
+
+
+def _condition(rng: random.Random, is_day: bool = True) -> dict:
+    code, day_text, night_text = rng.choice(CONDITIONS)
+    icon = 113 + CONDITIONS.index((code, day_text, night_text)) * 3
+    return {
+        "text": day_text if is_day else night_text,
+        "icon": f"//cdn.weatherapi.com/weather/64x64/{'day' if is_day else 'night'}/{icon}.png",
+        "code": code,
+    }
+
+
+def _location(q: str) -> dict:
+    match = COORDINATES.match(q)
+    if IP_ADDRESS.match(q.strip()):
+        # IP lookups resolve to a fixed city
+        return _location("Pune")
+    if match:
+        lat, lon = float(match.group(1)), float(match.group(2))
+        name = f"Place {abs(int(lat * 10))}-{abs(int(lon * 10))}"
+        rng = _rng("location", name.lower())
+    else:
+        name = q.split(",")[0].strip().title()
+        # Every spelling of a city ("pune", "Pune, India") is the same place
+        rng = _rng("location", name.lower())
+        lat, lon = round(rng.uniform(-60, 60), 2), round(rng.uniform(-180, 180), 2)
+    now = datetime.utcnow()
+    return {
+        "name": name,
+        "region": f"{name} Region",
+        "country": rng.choice(["India", "United Kingdom", "United States", "Japan", "Brazil"]),
+        "lat": lat,
+        "lon": lon,
+        "tz_id": "Etc/UTC",
+        "localtime_epoch": int(now.timestamp()),
+        "localtime": now.strftime("%Y-%m-%d %H:%M"),
+    }
+
+
+def _current(q: str) -> dict:
+    rng = _rng("current", q.strip().lower(), datetime.utcnow().strftime("%Y-%m-%d %H"))
+    temp_c = round(rng.uniform(-5, 38), 1)
+    wind_kph = round(rng.uniform(0, 40), 1)
+    return {
+        "last_updated": datetime.utcnow().strftime("%Y-%m-%d %H:%M"),
+        "temp_c": temp_c,
+        "temp_f": round(temp_c * 9 / 5 + 32, 1),
+        "is_day": 1,
+        "condition": _condition(rng),
+        "wind_mph": round(wind_kph / 1.609, 1),
+        "wind_kph": wind_kph,
+        "wind_degree": rng.randint(0, 359),
+        "wind_dir": rng.choice(["N", "NE", "E", "SE", "S", "SW", "W", "NW"]),
+        "pressure_mb": float(rng.randint(990, 1030)),
+        "pressure_in": round(rng.uniform(29.2, 30.4), 2),
+        "precip_mm": round(rng.uniform(0, 5), 1),
+        "humidity": rng.randint(20, 100),
+        "cloud": rng.randint(0, 100),
+        "feelslike_c": round(temp_c + rng.uniform(-3, 3), 1),
+        "feelslike_f": round((temp_c + 1) * 9 / 5 + 32, 1),
+        "vis_km": 10.0,
+        "vis_miles": 6.0,
+        "uv": float(rng.randint(1, 11)),
+        "gust_mph": round(wind_kph / 1.2, 1),
+        "gust_kph": round(wind_kph * 1.3, 1),
+        "air_quality": {
+            "co": round(rng.uniform(200, 900), 1),
+            "no2": round(rng.uniform(1, 60), 1),
+            "o3": round(rng.uniform(10, 120), 1),
+            "so2": round(rng.uniform(1, 20), 1),
+            "pm2_5": round(rng.uniform(2, 90), 1),
+            "pm10": round(rng.uniform(5, 150), 1),
+            "us-epa-index": rng.randint(1, 4),
+            "gb-defra-index": rng.randint(1, 6),
+        },
+    }
+
+
+def _forecast_day(q: str, date: str) -> dict:
+    rng = _rng("day", q.strip().lower(), date)
+    low = rng.uniform(-5, 25)
+    high = low + rng.uniform(3, 12)
+    hours = []
+    for hour in range(24):
+        temp_c = round(low + (high - low) * (1 - abs(hour - 14) / 14), 1)
+        chance = rng.randint(0, 100)
+        hours.append({
+            "time_epoch": 0,
+            "time": f"{date} {hour:02d}:00",
+            "temp_c": temp_c,
+            "temp_f": round(temp_c * 9 / 5 + 32, 1),
+            "is_day": int(6 <= hour < 19),
+            "condition": _condition(rng, 6 <= hour < 19),
+            "wind_mph": round(rng.uniform(0, 20), 1),
+            "wind_kph": round(rng.uniform(0, 32), 1),
+            "wind_degree": rng.randint(0, 359),
+            "wind_dir": rng.choice(["N", "E", "S", "W"]),
+            "pressure_mb": float(rng.randint(990, 1030)),
+            "precip_mm": round(rng.uniform(0, 2), 1),
+            "humidity": rng.randint(20, 100),
+            "cloud": rng.randint(0, 100),
+            "feelslike_c": round(temp_c + rng.uniform(-2, 2), 1),
+            "feelslike_f": round(temp_c * 9 / 5 + 33, 1),
+            "will_it_rain": int(chance > 60),
+            "chance_of_rain": chance,
+            "uv": float(rng.randint(0, 11)),
+        })
+    chance = rng.randint(0, 100)
+    return {
+        "date": date,
+        "date_epoch": 0,
+        "day": {
+            "maxtemp_c": round(high, 1),
+            "maxtemp_f": round(high * 9 / 5 + 32, 1),
+            "mintemp_c": round(low, 1),
+            "mintemp_f": round(low * 9 / 5 + 32, 1),
+            "avgtemp_c": round((low + high) / 2, 1),
+            "avgtemp_f": round((low + high) / 2 * 9 / 5 + 32, 1),
+            "maxwind_mph": round(rng.uniform(5, 25), 1),
+            "maxwind_kph": round(rng.uniform(8, 40), 1),
+            "totalprecip_mm": round(rng.uniform(0, 20), 1),
+            "totalprecip_in": round(rng.uniform(0, 0.8), 2),
+            "avgvis_km": 10.0,
+            "avghumidity": float(rng.randint(30, 95)),
+            "daily_will_it_rain": int(chance > 60),
+            "daily_chance_of_rain": chance,
+            "condition": _condition(rng),
+            "uv": float(rng.randint(1, 11)),
+        },
+        "astro": {
+            "sunrise": "06:21 AM",
+            "sunset": "06:14 PM",
+            "moonrise": "09:02 PM",
+            "moonset": "09:41 AM",
+            "moon_phase": rng.choice(["New Moon", "Waxing Crescent", "Full Moon", "Waning Gibbous"]),
+            "moon_illumination": str(rng.randint(0, 100)),
+        },
+        "hour": hours,
+    }
+
+
+async def _simulate(path: str, q: str):
+    """Apply latency and injected errors; returns an error response or None"""
+    CALLS[path] += 1
+    delay = max(0.0, CONFIG["latency_ms"] + random.uniform(-1, 1) * CONFIG["jitter_ms"])
+    await asyncio.sleep(delay / 1000)
+    roll = random.random()
+    if roll < CONFIG["error_rate"]:
+        return JSONResponse(status_code=500, content={"error": {"code": 9999, "message": "Internal application error."}})
+    if roll < CONFIG["error_rate"] + CONFIG["quota_rate"]:
+        return JSONResponse(status_code=403, content={"error": {"code": 2007, "message": "API key has exceeded calls per month quota."}})
+    # Queries containing "unknown" behave like a location WeatherAPI cannot resolve
+    if not q.strip() or "unknown" in q.lower():
+        return JSONResponse(status_code=400, content={"error": {"code": 1006, "message": "No matching location found."}})
+    return None
+
+
+@app.get("/v1/current.json")
+async def current(q: str = Query(""), key: str = Query(""), aqi: str = Query("no")):
+    error = await _simulate("current.json", q)
+    if error:
+        return error
+    return {"location": _location(q), "current": _current(q)}
+
+
+@app.get("/v1/forecast.json")
+async def forecast(q: str = Query(""), key: str = Query(""), days: int = Query(1),
+                   aqi: str = Query("no"), alerts: str = Query("no")):
+    error = await _simulate("forecast.json", q)
+    if error:
+        return error
+    today = datetime.utcnow().date()
+    return {
+        "location": _location(q),
+        "current": _current(q),
+        "forecast": {
+            "forecastday": [
+                _forecast_day(q, (today + timedelta(days=i)).isoformat())
+                for i in range(max(1, min(days, 14)))
+            ]
+        },
+    }
+
+
+@app.get("/v1/history.json")
+async def history(q: str = Query(""), key: str = Query(""), dt: str = Query("")):
+    error = await _simulate("history.json", q)
+    if error:
+        return error
+    return {"location": _location(q), "forecast": {"forecastday": [_forecast_day(q, dt)]}}
+
+
+@app.get("/__stats")
+async def stats():
+    """Upstream calls received so far, by path"""
+    return {"calls": dict(CALLS), "total": sum(CALLS.values()), "config": CONFIG}
+
+
+@app.post("/__reset")
+async def reset():
+    CALLS.clear()
+    return {"calls": {}}
+
+
+@app.post("/__config")
+async def configure(config: dict):
+    """Change latency / error rates at runtime"""
+    for name, value in config.items():
+        if name in CONFIG:
+            CONFIG[name] = float(value)
+    return CONFIG
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=CONFIG["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=CONFIG["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=CONFIG["error_rate"])
+    parser.add_argument("--quota-rate", type=float, default=CONFIG["quota_rate"])
+    args = parser.parse_args()
+    CONFIG.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        quota_rate=args.quota_rate,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Load test every /weather/* route and report throughput and latency as JSON.
+
+Start the fake upstream and point the backend at it, then run the harness:
+
+    python bench/fake_weatherapi.py --port 9000 &
+    WEATHER_API_BASE_URL=http://127.0.0.1:9000/v1 WEATHER_API_KEY=bench \\
+        uvicorn main:app --port 8000 &
+    python bench/run_benchmark.py --concurrency 50 --requests 2000 > baseline.json
+
+Upstream call counts are read from the fake server's /__stats endpoint.
+Compare two runs by diffing their JSON output.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+DEFAULT_CITIES = [
+    "Pune", "Mumbai", "Delhi", "London", "Paris", "Tokyo", "New York", "Sydney",
+    "Berlin", "Madrid", "Toronto", "Cairo", "Lima", "Seoul", "Nairobi", "Oslo",
+]
+
+
+def _coordinates(rng: random.Random) -> dict:
+    # Points scattered around Pune so nearby lookups can share cache cells
+    return {"lat": round(18.52 + rng.uniform(-0.2, 0.2), 4), "lon": round(73.85 + rng.uniform(-0.2, 0.2), 4)}
+
+
+# Route name -> function building (method, path, params, json body)
+ROUTES: Dict[str, Callable[[random.Random, List[str]], tuple]] = {
+    "current": lambda rng, cities: ("GET", "/weather/current", {"city": rng.choice(cities)}, None),
+    "coordinates": lambda rng, cities: ("GET", "/weather/coordinates", _coordinates(rng), None),
+    "batch": lambda rng, cities: (
+        "POST", "/weather/current/batch", {}, {"locations": rng.sample(cities, min(10, len(cities)))}
+    ),
+    "forecast": lambda rng, cities: (
+        "GET", "/weather/forecast", {"city": rng.choice(cities), "days": rng.choice([3, 5])}, None
+    ),
+    "history": lambda rng, cities: ("GET", "/weather/history", {"city": rng.choice(cities), "days": 3}, None),
+    "location": lambda rng, cities: ("GET", "/weather/location", {}, None),
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], statuses: Counter, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1] if latencies else None),
+            "mean": ms(sum(latencies) / len(latencies) if latencies else None),
+        },
+        "status": dict(sorted(statuses.items())),
+        "errors": sum(count for status, count in statuses.items() if not status.startswith("2")),
+    }
+
+
+async def upstream_calls(client: httpx.AsyncClient, stats_url: Optional[str]) -> Optional[dict]:
+    if not stats_url:
+        return None
+    try:
+        response = await client.get(stats_url)
+        return response.json().get("calls", {})
+    except (httpx.HTTPError, ValueError):
+        return None
+
+
+async def run_route(client: httpx.AsyncClient, base_url: str, route: str, cities: List[str],
+                    concurrency: int, total: int, seed: int) -> tuple:
+    """Send ``total`` requests to one route from ``concurrency`` workers"""
+    build = ROUTES[route]
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            method, path, params, body = build(rng, cities)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, base_url + path, params=params, json=body)
+                await response.aread()
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+async def benchmark(args) -> dict:
+    cities = [city.strip() for city in args.cities.split(",") if city.strip()]
+    routes = [route.strip() for route in args.routes.split(",") if route.strip()]
+    unknown = [route for route in routes if route not in ROUTES]
+    if unknown:
+        raise SystemExit(f"Unknown routes: {', '.join(unknown)} (choose from {', '.join(ROUTES)})")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        if args.reset_upstream and args.upstream_stats:
+            await client.post(args.upstream_stats.rsplit("/", 1)[0] + "/__reset")
+
+        results = {}
+        for index, route in enumerate(routes):
+            before = await upstream_calls(client, args.upstream_stats)
+            if args.warmup:
+                await run_route(client, args.base_url, route, cities, args.concurrency,
+                                args.warmup, args.seed + index + 1000)
+                before = await upstream_calls(client, args.upstream_stats)
+            latencies, statuses, elapsed = await run_route(
+                client, args.base_url, route, cities, args.concurrency, args.requests, args.seed + index
+            )
+            result = summarize(latencies, statuses, elapsed)
+            after = await upstream_calls(client, args.upstream_stats)
+            if before is not None and after is not None:
+                result["upstream_calls"] = {
+                    path: count - before.get(path, 0)
+                    for path, count in after.items() if count - before.get(path, 0)
+                }
+                result["upstream_calls_total"] = sum(result["upstream_calls"].values())
+            results[route] = result
+
+    return {
+        "started_at": args.started_at,
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "requests_per_route": args.requests,
+        "cities": len(cities),
+        "python": platform.python_version(),
+        "routes": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Backend under test")
+    parser.add_argument("--upstream-stats", default="http://127.0.0.1:9000/__stats",
+                        help="Fake WeatherAPI stats URL (empty to skip upstream counts)")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="Comma-separated routes to run")
+    parser.add_argument("--cities", default=",".join(DEFAULT_CITIES), help="Comma-separated city pool")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per route")
+    parser.add_argument("--warmup", type=int, default=0, help="Unmeasured requests per route first")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reset-upstream", action="store_true", help="Reset the fake's call counts first")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    args.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    report = asyncio.run(benchmark(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
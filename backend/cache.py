@@ -0,0 +1,166 @@
+"""In-process TTL/LRU cache for upstream weather responses."""
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterator, Optional, Tuple
+
+# Per-endpoint freshness (seconds); the frontend treats data as good for 10 minutes
+CACHE_TTLS = {
+    "current": int(os.getenv("CACHE_TTL_CURRENT", 600)),
+    "coordinates": int(os.getenv("CACHE_TTL_COORDINATES", 600)),
+    "forecast": int(os.getenv("CACHE_TTL_FORECAST", 1800)),
+    # Today's (still changing) history vs. a completed past day
+    "history": int(os.getenv("CACHE_TTL_HISTORY", 1800)),
+    "history_final": int(os.getenv("CACHE_TTL_HISTORY_FINAL", 30 * 24 * 3600)),
+}
+# How long an expired entry may still be served while it is refreshed
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", 300))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 5000))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+_WHITESPACE = re.compile(r"\s+")
+_COMMA = re.compile(r"\s*,\s*")
+
+
+def normalize_location(query: str) -> str:
+    """Normalize a location query so equivalent spellings share a cache key"""
+    query = _WHITESPACE.sub(" ", query.strip().lower())
+    return _COMMA.sub(",", query)
+
+
+def make_key(endpoint: str, location: str, **params) -> tuple:
+    """Build a cache key from the endpoint, normalized location and params"""
+    return (endpoint, normalize_location(location)) + tuple(
+        sorted((name, str(value).lower()) for name, value in params.items())
+    )
+
+
+class CacheEntry:
+    __slots__ = ("value", "size", "fetched_at", "expires_at", "stale_until")
+
+    def __init__(self, value: Any, size: int, fetched_at: float, ttl: float, stale_ttl: float):
+        self.value = value
+        self.size = size
+        self.fetched_at = fetched_at
+        self.expires_at = fetched_at + ttl
+        self.stale_until = self.expires_at + stale_ttl
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) < self.expires_at
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (time.time() if now is None else now) - self.fetched_at
+
+
+class TTLCache:
+    """LRU cache bounded by entry count and an approximate byte budget.
+
+    ``get`` returns entries that are fresh or within their stale window so
+    callers can serve them immediately and refresh in the background.
+    Older entries stay until evicted and are available as a last resort
+    through ``last_good``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        stale_ttl: float = CACHE_STALE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        now = time.time()
+        if entry is None or now >= entry.stale_until:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        if entry.is_fresh(now):
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return entry
+
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        """Like ``get`` but without touching LRU order or hit statistics"""
+        entry = self._entries.get(key)
+        if entry is None or time.time() >= entry.stale_until:
+            return None
+        return entry
+
+    def last_good(self, key: Hashable) -> Optional[CacheEntry]:
+        """Most recent entry for ``key`` regardless of age"""
+        return self._entries.get(key)
+
+    def recent(self) -> Iterator[Tuple[Hashable, CacheEntry]]:
+        """Entries from most to least recently used"""
+        return reversed(self._entries.items())
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: float,
+        size: int = 0,
+        stale_ttl: Optional[float] = None,
+        fetched_at: Optional[float] = None,
+    ) -> CacheEntry:
+        if key in self._entries:
+            self._remove(key)
+        entry = CacheEntry(
+            value,
+            size,
+            time.time() if fetched_at is None else fetched_at,
+            ttl,
+            self.stale_ttl if stale_ttl is None else stale_ttl,
+        )
+        self._entries[key] = entry
+        self.bytes += size
+        self._evict()
+        return entry
+
+    def delete(self, key: Hashable):
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.bytes > self.max_bytes
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
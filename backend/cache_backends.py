@@ -0,0 +1,322 @@
+"""Shared (L2) cache backends behind the in-process response cache.
+
+Every uvicorn worker keeps its own TTLCache. A shared backend lets workers
+on one host (SQLite) or across instances (Redis) reuse each other's
+upstream payloads, so upstream calls scale with distinct locations rather
+than with the number of workers.
+
+Values are stored as the raw upstream response bytes plus a small header
+with their fetch and expiry times, so nothing is re-encoded on the way in.
+Backend failures are logged and treated as misses.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import struct
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# "" (in-process cache only), "memory", "sqlite" or "redis"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "").lower()
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "weather_cache.sqlite3")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
+CACHE_REDIS_POOL_SIZE = int(os.getenv("CACHE_REDIS_POOL_SIZE", 4))
+CACHE_BACKEND_TIMEOUT = float(os.getenv("CACHE_BACKEND_TIMEOUT", 0.5))
+CACHE_KEY_PREFIX = "weather:"
+
+# fetched_at, expires_at
+_HEADER = struct.Struct("<dd")
+
+
+def encode_key(key: tuple) -> str:
+    """Stable string form of a cache key tuple"""
+    parts = []
+    for part in key:
+        if isinstance(part, tuple):
+            parts.append("=".join(part))
+        else:
+            parts.append(str(part))
+    return CACHE_KEY_PREFIX + "|".join(parts)
+
+
+def pack(raw: bytes, fetched_at: float, expires_at: float) -> bytes:
+    return _HEADER.pack(fetched_at, expires_at) + raw
+
+
+def unpack(blob: bytes) -> Tuple[bytes, float, float]:
+    """Split a stored value into (raw payload, fetched_at, expires_at)"""
+    fetched_at, expires_at = _HEADER.unpack_from(blob)
+    return blob[_HEADER.size:], fetched_at, expires_at
+
+
+class CacheBackend:
+    """Byte store with per-key expiry.
+
+    Subclasses implement ``_get``/``_set``; the public methods count hits,
+    misses and errors so backends can be compared.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            value = await asyncio.wait_for(self._get(key), CACHE_BACKEND_TIMEOUT)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"{self.name} cache get failed: {str(e) or type(e).__name__}")
+            return None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        """Store ``value`` for ``ttl`` seconds"""
+        if ttl <= 0:
+            return
+        try:
+            await asyncio.wait_for(self._set(key, value, ttl), CACHE_BACKEND_TIMEOUT)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"{self.name} cache set failed: {str(e) or type(e).__name__}")
+
+    async def close(self):
+        pass
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def _set(self, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class MemoryBackend(CacheBackend):
+    """Process-local store; useful for a single worker and for testing"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000):
+        super().__init__()
+        self.max_entries = max_entries
+        self._values: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        item = self._values.get(key)
+        if item is None:
+            return None
+        if time.time() >= item[1]:
+            del self._values[key]
+            return None
+        self._values.move_to_end(key)
+        return item[0]
+
+    async def _set(self, key: str, value: bytes, ttl: float):
+        self._values[key] = (value, time.time() + ttl)
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_entries:
+            self._values.popitem(last=False)
+
+
+class SQLiteBackend(CacheBackend):
+    """Host-wide store shared by all workers through one SQLite file.
+
+    WAL mode lets readers proceed while another worker writes. Queries run
+    on a dedicated thread so the event loop never waits on disk.
+    """
+
+    name = "sqlite"
+    # Purge expired rows after this many writes
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH):
+        super().__init__()
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _read(self, key: str) -> Optional[bytes]:
+        row = self._connect().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def _write(self, key: str, value: bytes, ttl: float):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl),
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._read, key)
+
+    async def _set(self, key: str, value: bytes, ttl: float):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._write, key, value, ttl)
+
+    async def close(self):
+        def close_connection():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, close_connection)
+        self._executor.shutdown(wait=False)
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection:
+    """Single connection speaking the RESP protocol (GET/SET only needs a few types)"""
+
+    def __init__(self, host: str, port: int, password: Optional[str], db: int):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.db = db
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self.command(b"AUTH", self.password.encode())
+        if self.db:
+            await self.command(b"SELECT", str(self.db).encode())
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def command(self, *args: bytes):
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self.writer.write(b"".join(out))
+        await self.writer.drain()
+        return await self._reply()
+
+    async def _reply(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise RedisError(rest.decode(errors="replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(rest)
+            if count < 0:
+                return None
+            return [await self._reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+
+class RedisBackend(CacheBackend):
+    """Store shared across instances through any Redis-protocol server"""
+
+    name = "redis"
+
+    def __init__(self, url: str = CACHE_REDIS_URL, pool_size: int = CACHE_REDIS_POOL_SIZE):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self._pool: "asyncio.LifoQueue[RedisConnection]" = asyncio.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put_nowait(RedisConnection(self.host, self.port, self.password, self.db))
+
+    async def _execute(self, *args: bytes):
+        conn = await self._pool.get()
+        try:
+            if conn.writer is None:
+                await conn.connect()
+            return await conn.command(*args)
+        except (OSError, asyncio.IncompleteReadError, asyncio.CancelledError, asyncio.TimeoutError):
+            # The connection state is unknown; reconnect on next use
+            conn.close()
+            raise
+        finally:
+            self._pool.put_nowait(conn)
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        return await self._execute(b"GET", key.encode())
+
+    async def _set(self, key: str, value: bytes, ttl: float):
+        await self._execute(b"SET", key.encode(), value, b"PX", str(int(ttl * 1000)).encode())
+
+    async def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+BACKENDS: Dict[str, type] = {
+    "memory": MemoryBackend,
+    "sqlite": SQLiteBackend,
+    "redis": RedisBackend,
+}
+
+
+def create_backend(name: str = CACHE_BACKEND) -> Optional[CacheBackend]:
+    """Backend configured by CACHE_BACKEND, or None for in-process caching only"""
+    if not name:
+        return None
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown CACHE_BACKEND {name!r} (choose from {', '.join(BACKENDS)})")
+    logger.info(f"Using {name} shared cache backend")
+    return BACKENDS[name]()
@@ -0,0 +1,109 @@
+"""Vectorized climate statistics over archived daily history."""
+import warnings
+from datetime import date, timedelta
+from typing import List, Optional
+
+import numpy as np
+
+from history_archive import NUMERIC_FIELDS
+
+# Days with at least this much precipitation count as rainy
+RAINY_DAY_MM = 1.0
+
+
+def _values(array: np.ndarray, digits: int = 2) -> List[Optional[float]]:
+    """JSON-ready list with NaN (missing days) as None"""
+    rounded = np.round(array, digits)
+    return [None if value != value else float(value) for value in rounded.tolist()]
+
+
+def _scalar(value, digits: int = 2) -> Optional[float]:
+    value = float(value)
+    return None if value != value else round(value, digits)
+
+
+def daily_columns(rows: List[tuple], start: date, end: date) -> dict:
+    """Arrange archive rows on a continuous daily axis; missing days are NaN"""
+    length = (end - start).days + 1
+    columns = {field: np.full(length, np.nan) for field in NUMERIC_FIELDS}
+    if rows:
+        offsets = np.fromiter(
+            ((date.fromisoformat(row[0]) - start).days for row in rows), dtype=np.int64, count=len(rows)
+        )
+        # None (field absent upstream) becomes NaN
+        values = np.array([row[1:] for row in rows], dtype=float)
+        for index, field in enumerate(NUMERIC_FIELDS):
+            columns[field][offsets] = values[:, index]
+    columns["present"] = ~np.isnan(columns["avgtemp_c"])
+    return columns
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over ``window`` days, ignoring missing days"""
+    present = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(present)))
+    lower = np.maximum(np.arange(1, len(values) + 1) - window, 0)
+    upper = np.arange(1, len(values) + 1)
+    window_sums = sums[upper] - sums[lower]
+    window_counts = counts[upper] - counts[lower]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+
+def summarize(rows: List[tuple], start: date, end: date, window: int = 7,
+              include_series: bool = True) -> dict:
+    """Aggregates (and optionally daily series) for archived days in [start, end]"""
+    columns = daily_columns(rows, start, end)
+    present = columns["present"]
+    available = int(present.sum())
+    result = {
+        "days_requested": len(present),
+        "days_available": available,
+    }
+    if not available:
+        result["summary"] = None
+        return result
+
+    with warnings.catch_warnings():
+        # Fields WeatherAPI omitted for every day reduce to NaN -> None
+        warnings.simplefilter("ignore", RuntimeWarning)
+        result.update(_aggregate(columns, start, window, include_series))
+    return result
+
+
+def _aggregate(columns: dict, start: date, window: int, include_series: bool) -> dict:
+    avg = columns["avgtemp_c"]
+    precip = columns["totalprecip_mm"]
+    period_mean = np.nanmean(avg)
+    summary = {
+        "temperature_c": {
+            "min": _scalar(np.nanmin(columns["mintemp_c"])),
+            "max": _scalar(np.nanmax(columns["maxtemp_c"])),
+            "mean": _scalar(period_mean),
+            "mean_daily_range": _scalar(np.nanmean(columns["maxtemp_c"] - columns["mintemp_c"])),
+        },
+        "precipitation_mm": {
+            "total": _scalar(np.nansum(precip)),
+            "daily_mean": _scalar(np.nanmean(precip)),
+            "max": _scalar(np.nanmax(precip)),
+            "rainy_days": int(np.sum(precip >= RAINY_DAY_MM)),
+        },
+        "humidity_mean": _scalar(np.nanmean(columns["avghumidity"])),
+        "wind_max_kph": _scalar(np.nanmax(columns["maxwind_kph"])),
+    }
+    result = {"summary": summary}
+    if include_series:
+        dates = [(start + timedelta(days=offset)).isoformat() for offset in range(len(avg))]
+        result["series"] = {
+            "date": dates,
+            "mintemp_c": _values(columns["mintemp_c"]),
+            "maxtemp_c": _values(columns["maxtemp_c"]),
+            "avgtemp_c": _values(avg),
+            "totalprecip_mm": _values(precip),
+            f"avgtemp_c_rolling_{window}d": _values(rolling_mean(avg, window)),
+            f"totalprecip_mm_rolling_{window}d": _values(rolling_mean(precip, window)),
+            "avgtemp_c_anomaly": _values(avg - period_mean),
+            "totalprecip_mm_anomaly": _values(precip - np.nanmean(precip)),
+        }
+    return result
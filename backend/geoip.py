@@ -0,0 +1,70 @@
+"""Client IP extraction and IP-prefix keys for location detection."""
+import ipaddress
+import os
+from typing import List, Optional, Union
+
+from starlette.requests import Request
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+# Proxies whose X-Forwarded-For header is trusted (load balancers, local nginx)
+TRUSTED_PROXIES: List[IPNetwork] = [
+    ipaddress.ip_network(network.strip(), strict=False)
+    for network in os.getenv(
+        "TRUSTED_PROXIES", "127.0.0.1/32,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+    ).split(",")
+    if network.strip()
+]
+# Addresses in the same network share a resolved location
+IP_LOCATION_PREFIX_V4 = int(os.getenv("IP_LOCATION_PREFIX_V4", 24))
+IP_LOCATION_PREFIX_V6 = int(os.getenv("IP_LOCATION_PREFIX_V6", 48))
+IP_LOCATION_TTL = int(os.getenv("IP_LOCATION_TTL", 24 * 3600))
+IP_LOCATION_MAX_ENTRIES = int(os.getenv("IP_LOCATION_MAX_ENTRIES", 50000))
+
+
+def parse_ip(value: Optional[str]) -> Optional[IPAddress]:
+    if not value:
+        return None
+    value = value.strip()
+    # "[v6]:port" or "v4:port" forms sent by some proxies
+    if value.startswith("["):
+        value = value[1:].split("]", 1)[0]
+    elif value.count(":") == 1:
+        value = value.split(":", 1)[0]
+    try:
+        return ipaddress.ip_address(value)
+    except ValueError:
+        return None
+
+
+def _trusted(ip: IPAddress) -> bool:
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_ip(request: Request) -> Optional[IPAddress]:
+    """The caller's address, following X-Forwarded-For through trusted proxies.
+
+    Hops are read right to left; the first one not added by a trusted proxy
+    is the client (anything further left could be forged by the client).
+    """
+    peer = parse_ip(request.client.host if request.client else None)
+    if peer is None or not _trusted(peer):
+        return peer
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded:
+        return peer
+    hops = [parse_ip(hop) for hop in forwarded.split(",")]
+    for hop in reversed(hops):
+        if hop is None:
+            break
+        if not _trusted(hop):
+            return hop
+        peer = hop
+    return peer
+
+
+def network_key(ip: IPAddress) -> str:
+    """The /24 (IPv4) or /48 (IPv6) network an address belongs to"""
+    prefix = IP_LOCATION_PREFIX_V4 if ip.version == 4 else IP_LOCATION_PREFIX_V6
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
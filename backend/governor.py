@@ -0,0 +1,326 @@
+"""Upstream quota governor: rate limiting, circuit breaking and hedged calls."""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import httpx
+
+from metrics import REGISTRY
+from upstream import UpstreamClient
+
+logger = logging.getLogger(__name__)
+
+# Request budget (0 disables the daily limit)
+UPSTREAM_RATE_PER_SECOND = float(os.getenv("UPSTREAM_RATE_PER_SECOND", 10))
+UPSTREAM_BURST = float(os.getenv("UPSTREAM_BURST", 20))
+UPSTREAM_DAILY_BUDGET = int(os.getenv("UPSTREAM_DAILY_BUDGET", 0))
+# Share of the burst and daily budget that background (prefetch) calls may not use
+UPSTREAM_USER_RESERVE = float(os.getenv("UPSTREAM_USER_RESERVE", 0.5))
+# How long a user call may wait for a rate-limit token (background calls never wait)
+UPSTREAM_USER_WAIT_SECONDS = float(os.getenv("UPSTREAM_USER_WAIT_SECONDS", 10))
+
+# Circuit breaker
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", 30))
+
+# Hedged retries and adaptive timeouts
+UPSTREAM_HEDGE_ENABLED = os.getenv("UPSTREAM_HEDGE_ENABLED", "false").lower() == "true"
+UPSTREAM_MIN_TIMEOUT = float(os.getenv("UPSTREAM_MIN_TIMEOUT", 2))
+# Latency samples needed before timeouts adapt and hedging starts
+LATENCY_WARMUP_SAMPLES = 20
+
+USER = "user"
+BACKGROUND = "background"
+
+REJECTED = REGISTRY.counter(
+    "upstream_rejected_total", "Upstream calls refused by the governor", ("reason", "priority")
+)
+HEDGED = REGISTRY.counter(
+    "upstream_hedged_total", "Hedged upstream calls by winner", ("winner",)
+)
+BREAKER_STATE = REGISTRY.gauge(
+    "upstream_circuit_open", "1 while the upstream circuit breaker is open"
+)
+
+
+class UpstreamUnavailable(Exception):
+    """The governor refused to call upstream (budget exhausted or circuit open)"""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.reason = reason
+        # Seconds until a call is likely to be allowed again
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, reserve: float = 0.0) -> bool:
+        """Take a token, leaving at least ``reserve`` tokens in the bucket"""
+        self._refill()
+        if self.tokens - 1 < reserve:
+            return False
+        self.tokens -= 1
+        return True
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Take a token, borrowing from future refills if the bucket is empty.
+
+        Returns the seconds to wait before using the token, or None (and
+        takes nothing) if that would exceed ``max_wait``. Borrowing queues
+        waiters in order: each one waits for the refill after the previous.
+        """
+        self._refill()
+        if self.tokens >= 1:
+            wait = 0.0
+        elif self.rate > 0:
+            wait = (1 - self.tokens) / self.rate
+        else:
+            return None
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+
+class DailyBudget:
+    """Upstream calls per UTC day; a limit of 0 means unlimited"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.day = None
+        self.used = 0
+
+    def try_acquire(self, reserve: float = 0.0) -> bool:
+        today = datetime.now(timezone.utc).date()
+        if today != self.day:
+            self.day = today
+            self.used = 0
+        if self.limit and self.used + 1 > self.limit - reserve:
+            return False
+        self.used += 1
+        return True
+
+    def seconds_until_reset(self) -> float:
+        now = datetime.now(timezone.utc)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+        return (midnight - now).total_seconds()
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one probe through after a cooldown"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 cooldown: float = BREAKER_COOLDOWN_SECONDS):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            # Let a single probe through
+            self.state = self.HALF_OPEN
+            return True
+        return False
+
+    def seconds_until_probe(self) -> float:
+        if self.state == self.CLOSED:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def release_probe(self):
+        """Give the half-open probe back if it was never sent"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("Upstream circuit closed")
+            BREAKER_STATE.set(0)
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Upstream circuit opened after {self.failures} failures")
+                BREAKER_STATE.set(1)
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class LatencyEstimate:
+    """Smoothed latency and deviation (as in TCP RTO estimation)"""
+
+    def __init__(self):
+        self.mean = 0.0
+        self.deviation = 0.0
+        self.samples = 0
+
+    def observe(self, seconds: float):
+        if self.samples == 0:
+            self.mean = seconds
+            self.deviation = seconds / 2
+        else:
+            self.deviation = 0.75 * self.deviation + 0.25 * abs(seconds - self.mean)
+            self.mean = 0.875 * self.mean + 0.125 * seconds
+        self.samples += 1
+
+    def back_off(self, timed_out_after: float):
+        """A call timed out: double the next timeout, as TCP does with its RTO.
+
+        Timed-out calls have no latency to observe; without this the estimate
+        would stay below a slower upstream and every call would time out.
+        """
+        self.mean = max(self.mean, timed_out_after)
+        self.deviation = max(self.deviation, timed_out_after / 4)
+
+    @property
+    def warm(self) -> bool:
+        return self.samples >= LATENCY_WARMUP_SAMPLES
+
+    def timeout(self, ceiling: float) -> float:
+        return max(UPSTREAM_MIN_TIMEOUT, min(ceiling, self.mean + 4 * self.deviation))
+
+    def hedge_delay(self) -> float:
+        return self.mean + 2 * self.deviation
+
+
+class UpstreamGovernor:
+    """Gatekeeper for every WeatherAPI call.
+
+    Enforces the per-second and per-day budget (background calls only get
+    what is left above the user reserve), trips a circuit breaker on
+    repeated failures and, when enabled, hedges slow calls with a second
+    request using timeouts adapted to observed latency.
+    """
+
+    def __init__(self, client: UpstreamClient):
+        self.client = client
+        self.bucket = TokenBucket(UPSTREAM_RATE_PER_SECOND, UPSTREAM_BURST)
+        self.daily = DailyBudget(UPSTREAM_DAILY_BUDGET)
+        self.breaker = CircuitBreaker()
+        self.hedge_enabled = UPSTREAM_HEDGE_ENABLED
+        self.latency: Dict[str, LatencyEstimate] = {}
+
+    def _acquire(self, priority: str, max_wait: float = 0.0) -> float:
+        """Take one call from the budgets; returns seconds to wait before making it.
+
+        User calls may wait up to ``max_wait`` for a rate-limit token;
+        background calls are rejected as soon as only the user reserve is left.
+        """
+        if not self.breaker.allow():
+            REJECTED.inc("circuit_open", priority)
+            raise UpstreamUnavailable("circuit_open", self.breaker.seconds_until_probe())
+        background = priority != USER
+        if background:
+            wait = 0.0
+            acquired = self.bucket.try_acquire(self.bucket.capacity * UPSTREAM_USER_RESERVE)
+        else:
+            wait = self.bucket.reserve(max_wait)
+            acquired = wait is not None
+        if not acquired:
+            self.breaker.release_probe()
+            REJECTED.inc("rate_limited", priority)
+            raise UpstreamUnavailable("rate_limited", 1 / self.bucket.rate if self.bucket.rate else 1.0)
+        daily_reserve = self.daily.limit * UPSTREAM_USER_RESERVE if background else 0.0
+        if not self.daily.try_acquire(daily_reserve):
+            self.breaker.release_probe()
+            REJECTED.inc("daily_budget", priority)
+            raise UpstreamUnavailable("daily_budget", self.daily.seconds_until_reset())
+        return wait
+
+    def _record(self, response: Optional[httpx.Response]):
+        # Quota errors and server errors count as failures; 4xx lookups do not
+        if response is None or response.status_code == 403 or response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    async def _call(self, path: str, params: dict, estimate: LatencyEstimate) -> httpx.Response:
+        ceiling = self.client.timeouts.get(path)
+        timeout = estimate.timeout(ceiling) if (estimate.warm and ceiling) else None
+        start = time.perf_counter()
+        try:
+            response = await self.client.get(path, params, timeout=timeout)
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        except httpx.TimeoutException:
+            if timeout is not None:
+                estimate.back_off(timeout)
+            self._record(None)
+            raise
+        except BaseException:
+            # Any failure counts (not only httpx errors), so a half-open
+            # probe is never left outstanding
+            self._record(None)
+            raise
+        estimate.observe(time.perf_counter() - start)
+        self._record(response)
+        return response
+
+    async def get(self, path: str, params: dict, priority: str = USER) -> httpx.Response:
+        """Call upstream, raising UpstreamUnavailable when the governor refuses"""
+        wait = self._acquire(priority, UPSTREAM_USER_WAIT_SECONDS if priority == USER else 0.0)
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+        estimate = self.latency.setdefault(path, LatencyEstimate())
+        if not (self.hedge_enabled and estimate.warm):
+            return await self._call(path, params, estimate)
+
+        primary = asyncio.ensure_future(self._call(path, params, estimate))
+        done, _ = await asyncio.wait({primary}, timeout=estimate.hedge_delay())
+        if done:
+            return primary.result()
+        try:
+            # The hedge is extra traffic, so it only uses the background share
+            self._acquire(BACKGROUND)
+        except UpstreamUnavailable:
+            return await primary
+        backup = asyncio.ensure_future(self._call(path, params, estimate))
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None or not pending:
+                        HEDGED.inc("primary" if task is primary else "hedge")
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "tokens": round(self.bucket.tokens, 2),
+            "daily_used": self.daily.used,
+            "daily_limit": self.daily.limit,
+        }
@@ -0,0 +1,200 @@
+"""On-disk archive of completed history days.
+
+A finished day's weather never changes, so each one is written to SQLite
+the first time it is fetched. /weather/history reads archived days before
+going upstream, and range queries and climate statistics are answered
+from the archive alone.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from responses import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+HISTORY_ARCHIVE_ENABLED = os.getenv("HISTORY_ARCHIVE_ENABLED", "true").lower() == "true"
+HISTORY_ARCHIVE_PATH = os.getenv("HISTORY_ARCHIVE_PATH", "weather_history.sqlite3")
+
+# Numeric daily fields stored as columns for range queries
+NUMERIC_FIELDS = (
+    "maxtemp_c", "mintemp_c", "avgtemp_c", "totalprecip_mm", "avghumidity", "maxwind_kph", "uv",
+)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS history_days (
+    location TEXT NOT NULL,
+    date TEXT NOT NULL,
+    {", ".join(f"{field} REAL" for field in NUMERIC_FIELDS)},
+    day BLOB NOT NULL,
+    PRIMARY KEY (location, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS history_locations (
+    location TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history_aliases (
+    query TEXT PRIMARY KEY,
+    location TEXT NOT NULL
+);
+"""
+
+
+class HistoryArchive:
+    """SQLite (WAL) store of completed days keyed by normalized location.
+
+    Queries run on a dedicated thread so the event loop never waits on disk.
+    """
+
+    def __init__(self, path: str = HISTORY_ARCHIVE_PATH):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-archive")
+        self._conn: Optional[sqlite3.Connection] = None
+        self.reads = 0
+        self.writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    # Writes
+
+    def _save(self, location: str, data: dict, queries: Iterable[str]):
+        conn = self._connect()
+        place = {key: value for key, value in data.get("location", {}).items()
+                 if key not in ("localtime", "localtime_epoch")}
+        rows = []
+        for forecast_day in data.get("forecast", {}).get("forecastday", []):
+            day = forecast_day.get("day", {})
+            rows.append((
+                location,
+                forecast_day["date"],
+                *(day.get(field) for field in NUMERIC_FIELDS),
+                dumps(day),
+            ))
+        if not rows:
+            return
+        conn.execute("BEGIN")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO history_locations (location, data) VALUES (?, ?)",
+                (location, dumps(place)),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO history_aliases (query, location) VALUES (?, ?)",
+                [(query, location) for query in queries if query != location],
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO history_days VALUES ({', '.join('?' * (len(NUMERIC_FIELDS) + 3))})",
+                rows,
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.writes += len(rows)
+
+    async def save(self, location: str, data: dict, queries: Iterable[str] = ()):
+        """Archive the days of a history.json payload (errors are logged).
+
+        ``queries`` are name queries known to resolve to ``location``; they are
+        kept so the location index can be rebuilt from the archive.
+        """
+        try:
+            await self._run(self._save, location, data, list(queries))
+        except Exception as e:
+            logger.warning(f"Failed to archive history for {location}: {str(e)}")
+
+    # Reads
+
+    def _load_day(self, location: str, date: str) -> Optional[dict]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT d.day, l.data FROM history_days d "
+            "JOIN history_locations l ON l.location = d.location "
+            "WHERE d.location = ? AND d.date = ?",
+            (location, date),
+        ).fetchone()
+        if row is None:
+            return None
+        self.reads += 1
+        return {
+            "location": loads(row[1]),
+            "forecast": {"forecastday": [{"date": date, "day": loads(row[0])}]},
+        }
+
+    async def load_day(self, location: str, date: str) -> Optional[dict]:
+        """A history.json-shaped payload for one archived day, if present"""
+        try:
+            return await self._run(self._load_day, location, date)
+        except Exception as e:
+            logger.warning(f"Failed to read archived history for {location}: {str(e)}")
+            return None
+
+    def _load_range(self, location: str, start: str, end: str):
+        conn = self._connect()
+        place = conn.execute(
+            "SELECT data FROM history_locations WHERE location = ?", (location,)
+        ).fetchone()
+        rows = conn.execute(
+            f"SELECT date, {', '.join(NUMERIC_FIELDS)} FROM history_days "
+            "WHERE location = ? AND date BETWEEN ? AND ? ORDER BY date",
+            (location, start, end),
+        ).fetchall()
+        self.reads += len(rows)
+        return (loads(place[0]) if place else None), rows
+
+    async def load_range(self, location: str, start: str, end: str
+                         ) -> Tuple[Optional[dict], List[tuple]]:
+        """(location, rows of (date, *NUMERIC_FIELDS)) for archived days in [start, end]"""
+        return await self._run(self._load_range, location, start, end)
+
+    def _places(self) -> List[Tuple[str, dict, Optional[str]]]:
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT l.location, l.data, a.query FROM history_locations l "
+            "LEFT JOIN history_aliases a ON a.location = l.location"
+        ).fetchall()
+        return [(location, loads(place), query) for location, place, query in rows]
+
+    async def places(self) -> List[Tuple[str, dict, Optional[str]]]:
+        """(location, place, query) for every archived location and its known queries"""
+        try:
+            return await self._run(self._places)
+        except Exception as e:
+            logger.warning(f"Failed to read archived locations: {str(e)}")
+            return []
+
+    def _count(self) -> Dict[str, int]:
+        conn = self._connect()
+        days, locations = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT location) FROM history_days"
+        ).fetchone()
+        return {"days": days, "locations": locations}
+
+    async def count(self) -> Dict[str, int]:
+        return await self._run(self._count)
+
+    async def close(self):
+        def close_connection():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        await self._run(close_connection)
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {"reads": self.reads, "writes": self.writes}
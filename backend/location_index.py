@@ -0,0 +1,150 @@
+"""Index of known locations for query canonicalization and prefix search."""
+import json
+import logging
+import os
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Set, Tuple
+
+from cache import normalize_location
+
+logger = logging.getLogger(__name__)
+
+# Optional JSON list of {"name", "region", "country", "lat", "lon"} objects
+# (the format of WeatherAPI's search.json) loaded at startup
+LOCATION_SEED_FILE = os.getenv("LOCATION_SEED_FILE", "")
+LOCATION_INDEX_MAX_ENTRIES = int(os.getenv("LOCATION_INDEX_MAX_ENTRIES", 100000))
+# Resolved query spellings kept; the oldest are forgotten first
+LOCATION_INDEX_MAX_ALIASES = int(os.getenv("LOCATION_INDEX_MAX_ALIASES", 200000))
+
+
+def location_id(place: dict) -> str:
+    """Stable query for a resolved place, e.g. "pune,maharashtra,india".
+
+    WeatherAPI resolves this to the same place every time, so it doubles as
+    the ``q`` sent upstream for every spelling of the location.
+    """
+    parts = (place.get("name"), place.get("region"), place.get("country"))
+    return normalize_location(",".join(part for part in parts if part))
+
+
+class LocationIndex:
+    """Aliases and a sorted (key, id) array searched with binary search.
+
+    Aliases map a normalized query to a location id. They only come from
+    queries WeatherAPI actually resolved: a bare name like "paris" is never
+    guessed from a place, since it may mean another place to WeatherAPI.
+    """
+
+    def __init__(self, max_entries: int = LOCATION_INDEX_MAX_ENTRIES,
+                 max_aliases: int = LOCATION_INDEX_MAX_ALIASES):
+        self.max_entries = max_entries
+        self.max_aliases = max_aliases
+        self._places: Dict[str, dict] = {}
+        self._aliases: Dict[str, str] = {}
+        # Reverse of _aliases: the spellings known for each place
+        self._spellings: Dict[str, Set[str]] = {}
+        self._keys: List[Tuple[str, str]] = []
+        self._indexed: Set[Tuple[str, str]] = set()
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+    def _index(self, key: str, place_id: str):
+        if (key, place_id) not in self._indexed:
+            self._indexed.add((key, place_id))
+            insort(self._keys, (key, place_id))
+
+    def _unalias(self, query: str):
+        place_id = self._aliases.pop(query, None)
+        if place_id is not None:
+            self._spellings[place_id].discard(query)
+
+    def _alias(self, query: str, place_id: str):
+        # Re-inserting keeps recently resolved spellings at the end
+        self._unalias(query)
+        self._aliases[query] = place_id
+        self._spellings.setdefault(place_id, set()).add(query)
+        while len(self._aliases) > self.max_aliases:
+            self._unalias(next(iter(self._aliases)))
+
+    def add(self, place: dict, query: Optional[str] = None) -> Optional[str]:
+        """Register a resolved place.
+
+        ``query`` is the name query WeatherAPI resolved to the place; it becomes
+        an alias of the place. Places learned from coordinates, IP lookups or
+        seed files are searchable but capture no queries.
+        """
+        if not place.get("name"):
+            return None
+        place_id = location_id(place)
+        if place_id not in self._places:
+            if len(self._places) >= self.max_entries:
+                return None
+            self._places[place_id] = {
+                "id": place_id,
+                "name": place.get("name"),
+                "region": place.get("region"),
+                "country": place.get("country"),
+                "lat": place.get("lat"),
+                "lon": place.get("lon"),
+            }
+            self._index(normalize_location(place["name"]), place_id)
+            self._index(place_id, place_id)
+        if query:
+            query = normalize_location(query)
+            if query != place_id:
+                self._alias(query, place_id)
+        return place_id
+
+    def canonical(self, query: str) -> Optional[str]:
+        """Location id for a query, if the place is known"""
+        query = normalize_location(query)
+        if query in self._places:
+            return query
+        return self._aliases.get(query)
+
+    def spellings(self, place_id: str) -> List[str]:
+        """Resolved queries that alias a place"""
+        return sorted(self._spellings.get(place_id, ()))
+
+    def search(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Known places whose name (or full id) starts with ``prefix``"""
+        prefix = normalize_location(prefix)
+        results: Dict[str, dict] = {}
+        index = bisect_left(self._keys, (prefix, ""))
+        while index < len(self._keys) and len(results) < limit:
+            key, place_id = self._keys[index]
+            if not key.startswith(prefix):
+                break
+            results.setdefault(place_id, self._places[place_id])
+            index += 1
+        return list(results.values())
+
+    def load_seed(self, path: str = LOCATION_SEED_FILE) -> int:
+        """Add places from a JSON seed file; returns how many were read"""
+        if not path:
+            return 0
+        try:
+            with open(path, encoding="utf-8") as f:
+                places = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load location seed file {path}: {str(e)}")
+            return 0
+        for place in places:
+            self.add(place)
+        logger.info(f"Loaded {len(places)} seed locations from {path}")
+        return len(places)
+
+    def export(self) -> dict:
+        """Places and aliases, for snapshots"""
+        return {"places": list(self._places.values()), "aliases": self._aliases}
+
+    def restore(self, state: dict):
+        for place in state.get("places", ()):
+            self.add(place)
+        for alias, place_id in state.get("aliases", {}).items():
+            if place_id in self._places:
+                self._alias(alias, place_id)
+
+    def stats(self) -> dict:
+        return {"locations": len(self._places), "aliases": len(self._aliases)}
@@ -0,0 +1,120 @@
+"""Per-location view of cached upstream data, shared across endpoints.
+
+forecast.json returns the current conditions plus N days, so a cached
+forecast can answer a current-weather request or a forecast request for
+fewer days. The store indexes the newest current and forecast payloads by
+normalized location and derives those responses while they are fresh.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from cache import CACHE_MAX_ENTRIES, CACHE_TTLS
+
+# Params that only add data to a payload; a "yes" payload also serves "no"
+OPTIONAL_SECTIONS = ("aqi", "alerts")
+
+LOCATION_STORE_ENABLED = os.getenv("LOCATION_STORE_ENABLED", "true").lower() == "true"
+
+
+class Snapshot:
+    """An upstream payload with the params it was fetched with"""
+
+    __slots__ = ("data", "params", "fetched_at", "expires_at")
+
+    def __init__(self, data: dict, params: dict, fetched_at: float, expires_at: float):
+        self.data = data
+        self.params = params
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+
+    def covers(self, params: dict) -> bool:
+        """Whether this payload contains everything a request with ``params`` needs"""
+        for name, value in params.items():
+            if name == "days":
+                continue
+            have = str(self.params.get(name, "no")).lower()
+            want = str(value).lower()
+            if have != want and not (name in OPTIONAL_SECTIONS and want == "no"):
+                return False
+        return True
+
+
+class LocationRecord:
+    __slots__ = ("current", "forecast")
+
+    def __init__(self):
+        self.current: Optional[Snapshot] = None
+        self.forecast: Optional[Snapshot] = None
+
+
+class LocationStore:
+    """Newest current/forecast payloads per location (LRU bounded)"""
+
+    def __init__(self, max_locations: int = CACHE_MAX_ENTRIES):
+        self.max_locations = max_locations
+        self._records: "OrderedDict[str, LocationRecord]" = OrderedDict()
+        self.derived: Dict[str, int] = {"current": 0, "forecast": 0}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def ingest(self, path: str, location: str, params: dict, data: dict,
+               fetched_at: float, expires_at: float):
+        """Index a payload fetched from ``path`` (current.json or forecast.json)"""
+        if path not in ("current.json", "forecast.json") or "current" not in data:
+            return
+        record = self._records.get(location)
+        if record is None:
+            record = self._records[location] = LocationRecord()
+            if len(self._records) > self.max_locations:
+                self._records.popitem(last=False)
+        self._records.move_to_end(location)
+
+        snapshot = Snapshot(data, params, fetched_at, expires_at)
+        # A forecast's current conditions are only as good as a current.json fetch
+        current_expiry = min(expires_at, fetched_at + CACHE_TTLS["current"])
+        if record.current is None or record.current.fetched_at <= fetched_at:
+            record.current = Snapshot(data, params, fetched_at, current_expiry)
+        if path == "forecast.json" and (
+            record.forecast is None
+            or len(data.get("forecast", {}).get("forecastday", []))
+            >= len(record.forecast.data.get("forecast", {}).get("forecastday", []))
+            or record.forecast.expires_at <= time.time()
+        ):
+            record.forecast = snapshot
+
+    def current(self, location: str, params: dict) -> Optional[Tuple[dict, float, float]]:
+        """(payload, fetched_at, expires_at) of fresh current conditions, if known"""
+        record = self._records.get(location)
+        snapshot = record.current if record else None
+        if snapshot is None or snapshot.expires_at <= time.time() or not snapshot.covers(params):
+            return None
+        self.derived["current"] += 1
+        data = {"location": snapshot.data["location"], "current": snapshot.data["current"]}
+        return data, snapshot.fetched_at, snapshot.expires_at
+
+    def forecast(self, location: str, params: dict) -> Optional[Tuple[dict, float, float]]:
+        """(payload, fetched_at, expires_at) of a fresh forecast with enough days"""
+        record = self._records.get(location)
+        snapshot = record.forecast if record else None
+        if snapshot is None or snapshot.expires_at <= time.time() or not snapshot.covers(params):
+            return None
+        days = int(params.get("days", 1))
+        forecast_days = snapshot.data.get("forecast", {}).get("forecastday", [])
+        if len(forecast_days) < days:
+            return None
+        self.derived["forecast"] += 1
+        data = {**snapshot.data, "forecast": {**snapshot.data["forecast"], "forecastday": forecast_days[:days]}}
+        return data, snapshot.fetched_at, snapshot.expires_at
+
+    def lookup(self, path: str, location: str, params: dict) -> Optional[Tuple[dict, float, float]]:
+        if path == "current.json":
+            return self.current(location, params)
+        if path == "forecast.json":
+            return self.forecast(location, params)
+        return None
+
+    def stats(self) -> dict:
+        return {"locations": len(self._records), "derived": dict(self.derived)}
@@ -1,14 +1,53 @@
+import time
+
+# Startup time (app_startup_seconds) is measured from here until the app is ready
+STARTUP_BEGAN = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import requests
+from fastapi.routing import APIRoute
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from contextlib import asynccontextmanager
+import asyncio
+import hmac
+import httpx
+import math
 import os
+import re
+import threading
 from dotenv import load_dotenv
-from typing import Optional
-import uvicorn
-from datetime import datetime, timedelta
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import logging
 
+from cache import CACHE_TTLS, CacheEntry, TTLCache, make_key, normalize_location
+from cache_backends import create_backend, encode_key, pack, unpack
+from geoip import IP_LOCATION_MAX_ENTRIES, IP_LOCATION_TTL, client_ip, network_key, parse_ip
+from governor import BACKGROUND, USER, UpstreamGovernor, UpstreamUnavailable
+from history_archive import HISTORY_ARCHIVE_ENABLED, HistoryArchive
+from location_index import LocationIndex
+from location_store import LOCATION_STORE_ENABLED, LocationStore
+from metrics import REGISTRY, MetricsMiddleware
+from prefetch import PREFETCH_ENABLED, PREFETCH_SEED_CITIES, PrefetchScheduler
+from profiler import ADMIN_TOKEN, PROFILE_DEFAULT_INTERVAL_MS, PROFILE_MAX_SECONDS, ProfilerBusy, SamplingProfiler
+from projections import (
+    CURRENT_WEATHER, FORECAST, HISTORY_DAY, HISTORY_LOCATION, Projection, UnknownFieldError,
+    to_columnar
+)
+from responses import (
+    FreshnessMiddleware, data_max_age, dumps, loads, note_expiry, note_stale, weather_response
+)
+from singleflight import SingleFlight
+from snapshot import (
+    CACHE_SNAPSHOT_ENABLED, CACHE_SNAPSHOT_MAX_AGE, CACHE_SNAPSHOT_MAX_ENTRIES, CacheSnapshot
+)
+from spatial import SpatialGrid, cell_query
+from subscriptions import SUBSCRIPTION_HEARTBEAT_SECONDS, SUBSCRIPTION_MAX_LOCATIONS, SubscriptionHub
+from timing import TimingMiddleware, phase
+from upstream import UpstreamClient
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,12 +55,49 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# WeatherAPI configuration
+WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
+WEATHER_API_BASE_URL = os.getenv("WEATHER_API_BASE_URL", "http://api.weatherapi.com/v1")
+
+if not WEATHER_API_KEY:
+    logger.warning("WEATHER_API_KEY not found in environment variables")
+
+# Shared upstream client (pooled, keep-alive)
+upstream = UpstreamClient(WEATHER_API_BASE_URL, WEATHER_API_KEY)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources at startup and release them at shutdown"""
+    await upstream.start()
+    location_index.load_seed()
+    if history_archive is not None:
+        await learn_archived_locations()
+    if CACHE_SNAPSHOT_ENABLED:
+        snapshot.load()
+        snapshot.start()
+    if PREFETCH_ENABLED:
+        seed_prefetch(PREFETCH_SEED_CITIES)
+        prefetcher.start()
+    STARTUP_SECONDS.set(time.perf_counter() - STARTUP_BEGAN)
+    logger.info(f"Startup completed in {(time.perf_counter() - STARTUP_BEGAN) * 1000:.0f} ms")
+    yield
+    if CACHE_SNAPSHOT_ENABLED:
+        await snapshot.stop()
+    await subscription_hub.close()
+    await prefetcher.stop()
+    await upstream.close()
+    if shared_cache is not None:
+        await shared_cache.close()
+    if history_archive is not None:
+        await history_archive.close()
+
 app = FastAPI(
     title="Weather Forecast API", 
     version="2.0.0",
     description="Professional Weather API with forecasting and historical data",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 origins=[
@@ -41,14 +117,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing"],
 )
 
-# WeatherAPI configuration
-WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
-WEATHER_API_BASE_URL = "http://api.weatherapi.com/v1"
+# Tracks the freshness of cached data used by each request (for Cache-Control)
+app.add_middleware(FreshnessMiddleware)
 
-if not WEATHER_API_KEY:
-    logger.warning("WEATHER_API_KEY not found in environment variables")
+# Per-route request counts and latency for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Server-Timing header and sampled timing logs (outermost, so totals include all middleware)
+app.add_middleware(TimingMiddleware)
 
 # Global error handler
 @app.exception_handler(Exception)
@@ -59,6 +138,389 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"detail": "Internal server error occurred"}
     )
 
+# Browser cache lifetime for search results (the index only grows)
+LOCATION_SEARCH_MAX_AGE = int(os.getenv("LOCATION_SEARCH_MAX_AGE", 300))
+
+# Longest date range for archive queries (days)
+HISTORY_RANGE_MAX_DAYS = int(os.getenv("HISTORY_RANGE_MAX_DAYS", 3660))
+
+# Maximum concurrent upstream calls per history request
+HISTORY_CONCURRENCY = int(os.getenv("HISTORY_CONCURRENCY", 4))
+
+# Batch endpoint limits
+BATCH_MAX_LOCATIONS = int(os.getenv("BATCH_MAX_LOCATIONS", 200))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 20))
+
+# Supported hourly resolutions for forecasts (hours)
+FORECAST_RESOLUTIONS = (1, 3, 6)
+
+COORDINATES_PATTERN = re.compile(r"^\s*-?\d+(\.\d+)?\s*,\s*-?\d+(\.\d+)?\s*$")
+
+# Shared cache of upstream payloads and in-progress background refreshes
+weather_cache = TTLCache()
+_refresh_tasks = {}
+
+# Optional cache shared between workers/instances, consulted on local misses
+shared_cache = create_backend()
+
+# Completed history days persisted across restarts
+history_archive = HistoryArchive() if HISTORY_ARCHIVE_ENABLED else None
+
+# Known places: canonical ids for every spelling, and prefix search
+location_index = LocationIndex()
+
+# Current/forecast payloads by location, so endpoints can answer from each other's data
+location_store = LocationStore()
+
+# Grid used to share cached data between nearby coordinates
+spatial_grid = SpatialGrid()
+SPATIAL_NEIGHBOUR_HITS = REGISTRY.counter(
+    "spatial_neighbour_hits_total", "Coordinate lookups answered by a warm neighbouring grid cell"
+)
+
+# Coalesces concurrent identical upstream calls
+upstream_calls = SingleFlight()
+
+# Rate limits, circuit breaking and hedging for every upstream call
+governor = UpstreamGovernor(upstream)
+
+STALE_SERVED = REGISTRY.counter(
+    "stale_fallback_total", "Responses served from last known good data", ("reason",)
+)
+
+def check_upstream_status(response: httpx.Response, not_found_detail: str):
+    """Map WeatherAPI error statuses onto API errors"""
+    if response.status_code == 400:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+    elif response.status_code == 401:
+        raise HTTPException(status_code=500, detail="API authentication failed")
+    elif response.status_code == 403:
+        raise HTTPException(status_code=500, detail="API quota exceeded")
+    response.raise_for_status()
+
+def cache_ttl(cache_as: str, data: dict) -> float:
+    """TTL for a payload; a finished day's history never changes"""
+    if cache_as == "history":
+        day = data.get("forecast", {}).get("forecastday") or [{}]
+        local_date = data.get("location", {}).get("localtime", "")[:10]
+        if day[0].get("date") and local_date and day[0]["date"] < local_date:
+            return CACHE_TTLS["history_final"]
+    return CACHE_TTLS[cache_as]
+
+async def fetch_and_store(key: tuple, path: str, location: str, cache_as: str,
+                          not_found_detail: str, params: dict,
+                          priority: str = USER) -> CacheEntry:
+    """Fetch a payload and store it in the response cache.
+
+    Data is derived from another endpoint's fresh payload for the location
+    when possible, then looked up in the history archive and the shared
+    cache, and only then fetched from WeatherAPI. Concurrent callers for the same key share a
+    single upstream call.
+    """
+    async def fetch():
+        entry = derive_entry(key, path, params)
+        if entry is not None:
+            return entry
+        if path == "history.json" and history_archive is not None:
+            archived = await history_archive.load_day(key[1], params["dt"])
+            if archived is not None:
+                return store_entry(key, path, params, archived, CACHE_TTLS["history_final"])
+        if shared_cache is not None:
+            with phase("shared_cache"):
+                entry = await load_shared(key)
+            if entry is not None:
+                return entry
+        query = normalize_location(location)
+        logger.info(f"Fetching {path} for: {query}")
+        with phase("upstream"):
+            response = await governor.get(path, {"q": query, **params}, priority)
+        check_upstream_status(response, not_found_detail)
+        with phase("decode"):
+            data = loads(response.content)
+        ttl = cache_ttl(cache_as, data)
+        entry = store_entry(key, path, params, data, ttl, size=len(response.content))
+        if history_archive is not None and ttl == CACHE_TTLS["history_final"]:
+            place_id = canonical_location(key[1])
+            await history_archive.save(place_id, data, location_index.spellings(place_id))
+        if shared_cache is not None:
+            # Store the upstream bytes as-is; no re-encoding
+            await shared_cache.set(
+                encode_key(key),
+                pack(response.content, entry.fetched_at, entry.expires_at),
+                entry.stale_until - entry.fetched_at,
+            )
+        return entry
+
+    return await upstream_calls.do(key, fetch)
+
+async def learn_archived_locations():
+    """Rebuild the location ids archived history is keyed by"""
+    for location, place, query in await history_archive.places():
+        location_index.add(place, query)
+
+def canonical_location(query: str) -> str:
+    """Location id for a known place, else the normalized query"""
+    return location_index.canonical(query) or normalize_location(query)
+
+def store_entry(key: tuple, path: str, params: dict, data: dict, ttl: float,
+                size: int = 0, fetched_at: Optional[float] = None) -> CacheEntry:
+    """Cache a payload and index it for cross-endpoint reuse.
+
+    A place named by text is learned by the location index, and the payload
+    is also cached under the place's id so other spellings hit it.
+    """
+    entry = weather_cache.set(key, data, ttl, size=size, fetched_at=fetched_at)
+    query = key[1]
+    location = query
+    if "location" in data:
+        by_name = not (is_coordinates(query) or query == "auto:ip" or parse_ip(query))
+        place_id = location_index.add(data["location"], query if by_name else None)
+        if by_name and place_id and place_id != query:
+            location = place_id
+            # Shares the payload object, so it adds no bytes
+            weather_cache.set(
+                (key[0], place_id) + key[2:], data, ttl, fetched_at=entry.fetched_at
+            )
+    if LOCATION_STORE_ENABLED:
+        location_store.ingest(path, location, params, data, entry.fetched_at, entry.expires_at)
+    return entry
+
+def extends_cached(key: tuple, expires_at: float) -> bool:
+    """Whether data expiring at ``expires_at`` is newer than what is cached.
+
+    A refresh before expiry must not be answered with the data it is
+    refreshing (e.g. derived from the entry's own stored payload).
+    """
+    cached = weather_cache.last_good(key)
+    return cached is None or expires_at > cached.expires_at
+
+def derive_entry(key: tuple, path: str, params: dict) -> Optional[CacheEntry]:
+    """Answer a request from another endpoint's fresh data for the same location"""
+    if not LOCATION_STORE_ENABLED:
+        return None
+    derived = location_store.lookup(path, key[1], params)
+    if derived is None:
+        return None
+    data, fetched_at, expires_at = derived
+    if not extends_cached(key, expires_at):
+        return None
+    # The payload shares its parts with the source entry, so it adds no bytes
+    return weather_cache.set(key, data, expires_at - fetched_at, fetched_at=fetched_at)
+
+async def load_shared(key: tuple) -> Optional[CacheEntry]:
+    """Copy a fresh entry from the shared cache into the local cache"""
+    blob = await shared_cache.get(encode_key(key))
+    if blob is None:
+        return None
+    raw, fetched_at, expires_at = unpack(blob)
+    if expires_at <= time.time() or not extends_cached(key, expires_at):
+        # Another worker's copy is stale too (or is the copy we already have)
+        return None
+    return store_entry(
+        key, key[0], dict(key[2:]), loads(raw), expires_at - fetched_at,
+        size=len(raw), fetched_at=fetched_at
+    )
+
+def schedule_refresh(key: tuple, path: str, location: str, cache_as: str,
+                     not_found_detail: str, params: dict):
+    """Refresh a stale cache entry in the background (once per key)"""
+    if key in _refresh_tasks:
+        return
+
+    async def refresh():
+        try:
+            await fetch_and_store(
+                key, path, location, cache_as, not_found_detail, params, BACKGROUND
+            )
+        except Exception as e:
+            logger.warning(f"Background refresh failed for {key}: {str(e)}")
+
+    task = asyncio.create_task(refresh())
+    _refresh_tasks[key] = task
+    task.add_done_callback(lambda _: _refresh_tasks.pop(key, None))
+
+def service_unavailable(retry_after: float) -> HTTPException:
+    """503 telling clients when upstream calls are likely to be allowed again"""
+    return HTTPException(
+        status_code=503,
+        detail="Weather service temporarily unavailable",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+async def fetch_cached(path: str, location: str, cache_as: str,
+                       not_found_detail: str = "Location not found", **params) -> dict:
+    """Return upstream data from cache, serving stale entries while revalidating.
+
+    If upstream is unavailable (budget, open circuit, timeouts or server
+    errors), the last known good data is served with a staleness marker.
+    """
+    location = canonical_location(location)
+    key = make_key(path, location, **params)
+    if cache_as in PREFETCH_KINDS:
+        prefetcher.record(key, (path, location, cache_as, not_found_detail, params))
+    entry = weather_cache.get(key)
+    if entry is None:
+        try:
+            entry = await fetch_and_store(key, path, location, cache_as, not_found_detail, params)
+        except (UpstreamUnavailable, httpx.HTTPError, HTTPException) as e:
+            if isinstance(e, HTTPException) and e.status_code < 500:
+                raise
+            fallback = weather_cache.last_good(key)
+            if fallback is None:
+                if isinstance(e, UpstreamUnavailable):
+                    raise service_unavailable(e.retry_after)
+                raise
+            if isinstance(e, UpstreamUnavailable):
+                reason = e.reason
+            elif isinstance(e, httpx.TimeoutException):
+                reason = "timeout"
+            else:
+                reason = "upstream_error"
+            logger.warning(f"Serving stale data for {key} ({reason})")
+            STALE_SERVED.inc(reason)
+            note_stale(fallback.age(), reason)
+            return fallback.value
+    elif not entry.is_fresh():
+        schedule_refresh(key, path, location, cache_as, not_found_detail, params)
+    note_expiry(entry.expires_at)
+    return entry.value
+
+async def prefetch_refresh(key: tuple, target: tuple):
+    path, location, *rest = target
+    place_id = canonical_location(location)
+    if place_id != key[1]:
+        # Recorded before the place's id was known (seed cities, first
+        # requests); merge it into the key requests use now
+        canonical_key = (key[0], place_id) + key[2:]
+        target = (path, place_id, *rest)
+        prefetcher.rekey(key, canonical_key, target)
+        key = canonical_key
+        expires_at = cached_expiry(key)
+        if expires_at is not None and expires_at - time.time() > prefetcher.lead_seconds:
+            return
+    try:
+        await fetch_and_store(key, *target, priority=BACKGROUND)
+    except HTTPException as e:
+        if e.status_code == 404:
+            prefetcher.forget(key)
+        raise
+
+def cached_expiry(key: tuple) -> Optional[float]:
+    entry = weather_cache.peek(key)
+    return entry.expires_at if entry is not None else None
+
+# Keeps popular current/forecast entries warm within an upstream budget
+prefetcher = PrefetchScheduler(prefetch_refresh, cached_expiry)
+PREFETCH_KINDS = ("current", "coordinates", "forecast")
+
+# Cache, coalescing and prefetch stats are read when /metrics is scraped
+REGISTRY.callback(
+    "cache_events_total", "Response cache lookups and evictions", "counter",
+    lambda: {
+        ("hit",): weather_cache.hits,
+        ("stale_hit",): weather_cache.stale_hits,
+        ("miss",): weather_cache.misses,
+        ("eviction",): weather_cache.evictions,
+    },
+    ("event",)
+)
+REGISTRY.callback(
+    "cache_entries", "Entries in the response cache", "gauge",
+    lambda: {(): len(weather_cache)}
+)
+REGISTRY.callback(
+    "cache_bytes", "Approximate size of the response cache", "gauge",
+    lambda: {(): weather_cache.bytes}
+)
+REGISTRY.callback(
+    "upstream_coalesced_total", "Callers that shared another caller's upstream call", "counter",
+    lambda: {(): upstream_calls.coalesced}
+)
+REGISTRY.callback(
+    "shared_cache_events_total", "Shared cache backend lookups by outcome", "counter",
+    lambda: {} if shared_cache is None else {
+        (shared_cache.name, "hit"): shared_cache.hits,
+        (shared_cache.name, "miss"): shared_cache.misses,
+        (shared_cache.name, "error"): shared_cache.errors,
+    },
+    ("backend", "event")
+)
+REGISTRY.callback(
+    "derived_responses_total", "Requests answered from another endpoint's cached data", "counter",
+    lambda: {(kind,): count for kind, count in location_store.derived.items()},
+    ("kind",)
+)
+REGISTRY.callback(
+    "prefetch_refreshes_total", "Background prefetch refreshes by outcome", "counter",
+    lambda: {("ok",): prefetcher.refreshes, ("failed",): prefetcher.failures},
+    ("outcome",)
+)
+
+def seed_prefetch(cities: List[str]):
+    """Mark cities as popular before any traffic (e.g. the frontend default)"""
+    for city in cities:
+        # Known places (from the snapshot or history archive) use their id
+        city = canonical_location(city)
+        current = {"aqi": "yes"}
+        forecast = {"days": 5, "aqi": "yes", "alerts": "no"}
+        prefetcher.record(
+            make_key("current.json", city, **current),
+            ("current.json", city, "current", "City not found", current)
+        )
+        prefetcher.record(
+            make_key("forecast.json", city, **forecast),
+            ("forecast.json", city, "forecast", "Location not found", forecast)
+        )
+
+def select_projection(projection: Projection, fields: Optional[str]):
+    """Compiled extractor for a ``fields=`` selection"""
+    try:
+        return projection.select(fields)
+    except UnknownFieldError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Upstream paths whose hot entries are written to the warm-start snapshot
+SNAPSHOT_PATHS = ("current.json", "forecast.json")
+
+def collect_snapshot() -> dict:
+    """Most recently used upstream payloads and resolved locations"""
+    entries = []
+    for key, entry in weather_cache.recent():
+        if len(entries) >= CACHE_SNAPSHOT_MAX_ENTRIES:
+            break
+        # Entries without a size are derived from or alias another entry
+        if key[0] in SNAPSHOT_PATHS and entry.size:
+            entries.append([list(key), entry.fetched_at, entry.expires_at, entry.size, entry.value])
+    networks = [
+        [network, entry.value, entry.fetched_at, entry.expires_at]
+        for network, entry in ip_locations.recent() if entry.is_fresh()
+    ]
+    return {"entries": entries, "ip_locations": networks, "locations": location_index.export()}
+
+def restore_snapshot(state: dict) -> int:
+    """Load a snapshot, keeping each entry's original fetch and expiry times"""
+    now = time.time()
+    location_index.restore(state.get("locations", {}))
+    for network, location, fetched_at, expires_at in state.get("ip_locations", ()):
+        if expires_at > now:
+            ip_locations.set(network, location, expires_at - fetched_at, fetched_at=fetched_at)
+    restored = 0
+    # Oldest first, so the most recently used entries end up most recent again
+    for raw_key, fetched_at, expires_at, size, data in reversed(state.get("entries", ())):
+        if now - fetched_at > CACHE_SNAPSHOT_MAX_AGE:
+            continue
+        key = (raw_key[0], raw_key[1]) + tuple(tuple(param) for param in raw_key[2:])
+        store_entry(key, key[0], dict(key[2:]), data, expires_at - fetched_at,
+                    size=size, fetched_at=fetched_at)
+        restored += 1
+    return restored
+
+snapshot = CacheSnapshot(collect_snapshot, restore_snapshot)
+
+STARTUP_SECONDS = REGISTRY.gauge(
+    "app_startup_seconds", "Time from importing the app to being ready to serve"
+)
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -67,83 +529,51 @@ async def root():
         "status": "operational",
         "endpoints": [
             "/weather/current",
+            "/weather/current/batch",
+            "/weather/search",
+            "/weather/subscribe",
             "/weather/forecast", 
             "/weather/history",
+            "/weather/history/range",
             "/weather/location",
             "/weather/coordinates"
         ],
         "docs": "/docs"
     }
 
+@app.get("/weather/search")
+async def search_locations(
+    request: Request,
+    prefix: str = Query(..., min_length=1, description="Start of a place name"),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Autocomplete from places already resolved (no upstream calls)"""
+    return weather_response(
+        request, {"results": location_index.search(prefix, limit)}, LOCATION_SEARCH_MAX_AGE
+    )
+
 @app.get("/weather/current")
-async def get_current_weather(city: str = Query(..., description="City name or coordinates")):
+async def get_current_weather(
+    request: Request,
+    city: str = Query(..., description="City name or coordinates"),
+    fields: Optional[str] = Query(None, description="Comma-separated output fields, e.g. current.temp_c")
+):
     """Get current weather for a specific city"""
     if not WEATHER_API_KEY:
         raise HTTPException(status_code=500, detail="API key not configured")
     
+    project = select_projection(CURRENT_WEATHER, fields)
     try:
-        url = f"{WEATHER_API_BASE_URL}/current.json"
-        params = {
-            "key": WEATHER_API_KEY,
-            "q": city,
-            "aqi": "yes"
-        }
+        data = await fetch_cached(
+            "current.json", city, "current", "City not found", aqi="yes"
+        )
+        with phase("format"):
+            formatted_data = project(data)
+        return weather_response(request, formatted_data, data_max_age())
         
-        logger.info(f"Fetching current weather for: {city}")
-        response = requests.get(url, params=params, timeout=10)
-        
-        if response.status_code == 400:
-            raise HTTPException(status_code=404, detail="City not found")
-        elif response.status_code == 401:
-            raise HTTPException(status_code=500, detail="API authentication failed")
-        elif response.status_code == 403:
-            raise HTTPException(status_code=500, detail="API quota exceeded")
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        # Enhanced response formatting
-        formatted_data = {
-            "location": {
-                "name": data["location"]["name"],
-                "region": data["location"]["region"],
-                "country": data["location"]["country"],
-                "lat": data["location"]["lat"],
-                "lon": data["location"]["lon"],
-                "localtime": data["location"]["localtime"],
-                "tz_id": data["location"]["tz_id"]
-            },
-            "current": {
-                "temp_c": data["current"]["temp_c"],
-                "temp_f": data["current"]["temp_f"],
-                "feelslike_c": data["current"]["feelslike_c"],
-                "feelslike_f": data["current"]["feelslike_f"],
-                "condition": {
-                    "text": data["current"]["condition"]["text"],
-                    "icon": data["current"]["condition"]["icon"],
-                    "code": data["current"]["condition"]["code"]
-                },
-                "humidity": data["current"]["humidity"],
-                "wind_kph": data["current"]["wind_kph"],
-                "wind_mph": data["current"]["wind_mph"],
-                "wind_dir": data["current"]["wind_dir"],
-                "wind_degree": data["current"]["wind_degree"],
-                "pressure_mb": data["current"]["pressure_mb"],
-                "pressure_in": data["current"]["pressure_in"],
-                "visibility_km": data["current"]["vis_km"],
-                "visibility_miles": data["current"]["vis_miles"],
-                "uv": data["current"]["uv"],
-                "gust_kph": data["current"].get("gust_kph", 0),
-                "gust_mph": data["current"].get("gust_mph", 0)
-            },
-            "air_quality": data.get("current", {}).get("air_quality", {})
-        }
-        
-        return formatted_data
-        
-    except requests.Timeout:
+    except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Weather service timeout")
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Request error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch weather data")
     except KeyError as e:
@@ -152,201 +582,291 @@ async def get_current_weather(city: str = Query(..., description="City name or c
 
 @app.get("/weather/coordinates")
 async def get_weather_by_coordinates(
+    request: Request,
     lat: float = Query(..., description="Latitude", ge=-90, le=90),
-    lon: float = Query(..., description="Longitude", ge=-180, le=180)
+    lon: float = Query(..., description="Longitude", ge=-180, le=180),
+    fields: Optional[str] = Query(None, description="Comma-separated output fields, e.g. current.temp_c")
 ):
     """Get weather by coordinates (lat, lon)"""
     if not WEATHER_API_KEY:
         raise HTTPException(status_code=500, detail="API key not configured")
     
+    project = select_projection(CURRENT_WEATHER, fields)
     try:
-        # Format coordinates for WeatherAPI
-        location = f"{lat},{lon}"
-        
-        url = f"{WEATHER_API_BASE_URL}/current.json"
-        params = {
-            "key": WEATHER_API_KEY,
-            "q": location,
-            "aqi": "yes"
-        }
-        
-        logger.info(f"Fetching weather for coordinates: {lat}, {lon}")
-        response = requests.get(url, params=params, timeout=10)
-        
-        if response.status_code == 400:
-            raise HTTPException(status_code=404, detail="Invalid coordinates")
+        data = await fetch_spatial(
+            "current.json", lat, lon, "coordinates", "Invalid coordinates", aqi="yes"
+        )
+        # Echo the caller's exact coordinates; the data is for their grid cell
+        with phase("format"):
+            formatted_data = {**project(data), "query": {"lat": lat, "lon": lon}}
+        return weather_response(request, formatted_data, data_max_age())
         
-        response.raise_for_status()
-        data = response.json()
-        
-        # Use same formatting as current weather
-        formatted_data = {
-            "location": {
-                "name": data["location"]["name"],
-                "region": data["location"]["region"],
-                "country": data["location"]["country"],
-                "lat": data["location"]["lat"],
-                "lon": data["location"]["lon"],
-                "localtime": data["location"]["localtime"],
-                "tz_id": data["location"]["tz_id"]
-            },
-            "current": {
-                "temp_c": data["current"]["temp_c"],
-                "temp_f": data["current"]["temp_f"],
-                "feelslike_c": data["current"]["feelslike_c"],
-                "feelslike_f": data["current"]["feelslike_f"],
-                "condition": {
-                    "text": data["current"]["condition"]["text"],
-                    "icon": data["current"]["condition"]["icon"],
-                    "code": data["current"]["condition"]["code"]
-                },
-                "humidity": data["current"]["humidity"],
-                "wind_kph": data["current"]["wind_kph"],
-                "wind_mph": data["current"]["wind_mph"],
-                "wind_dir": data["current"]["wind_dir"],
-                "wind_degree": data["current"]["wind_degree"],
-                "pressure_mb": data["current"]["pressure_mb"],
-                "pressure_in": data["current"]["pressure_in"],
-                "visibility_km": data["current"]["vis_km"],
-                "visibility_miles": data["current"]["vis_miles"],
-                "uv": data["current"]["uv"],
-                "gust_kph": data["current"].get("gust_kph", 0),
-                "gust_mph": data["current"].get("gust_mph", 0)
-            },
-            "air_quality": data.get("current", {}).get("air_quality", {})
-        }
-        
-        return formatted_data
-        
-    except requests.Timeout:
+    except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Weather service timeout")
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Request error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch weather data")
 
+async def fetch_spatial(path: str, lat: float, lon: float, cache_as: str,
+                        not_found_detail: str = "Location not found", **params) -> dict:
+    """Fetch data for coordinates through the spatial grid.
+
+    Nearby callers share the upstream call for their grid cell; if the cell
+    is cold, a fresh entry of a close neighbouring cell is used instead.
+    """
+    own_query = cell_query(spatial_grid.cell(lat, lon))
+    if weather_cache.peek(make_key(path, own_query, **params)) is None:
+        for cell in spatial_grid.nearby_cells(lat, lon):
+            entry = weather_cache.peek(make_key(path, cell_query(cell), **params))
+            if entry is not None and entry.is_fresh():
+                SPATIAL_NEIGHBOUR_HITS.inc()
+                note_expiry(entry.expires_at)
+                return entry.value
+    return await fetch_cached(path, own_query, cache_as, not_found_detail, **params)
+
+def split_coordinates(location: str):
+    lat, lon = location.split(",")
+    return float(lat), float(lon)
+
+class BatchRequest(BaseModel):
+    locations: List[str]
+
+def is_coordinates(location: str) -> bool:
+    return COORDINATES_PATTERN.match(location) is not None
+
+async def resolve_current(location: str, semaphore: asyncio.Semaphore, project):
+    """Resolve current weather for one batch item, returning (status, body)"""
+    async with semaphore:
+        try:
+            if is_coordinates(location):
+                lat, lon = split_coordinates(location)
+                # Same bounds as /weather/coordinates; the grid would clamp and wrap them
+                if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                    return 400, {"detail": "Invalid coordinates"}
+                data = await fetch_spatial(
+                    "current.json", lat, lon, "coordinates", "Invalid coordinates", aqi="yes"
+                )
+                with phase("format"):
+                    return 200, {**project(data), "query": {"lat": lat, "lon": lon}}
+            data = await fetch_cached(
+                "current.json", location, "current", "Location not found", aqi="yes"
+            )
+            with phase("format"):
+                return 200, project(data)
+        except HTTPException as e:
+            return e.status_code, {"detail": e.detail}
+        except httpx.TimeoutException:
+            return 504, {"detail": "Weather service timeout"}
+        except httpx.HTTPError as e:
+            logger.error(f"Request error: {str(e)}")
+            return 500, {"detail": "Failed to fetch weather data"}
+        except KeyError as e:
+            logger.error(f"Data parsing error: {str(e)}")
+            return 500, {"detail": "Invalid response from weather service"}
+
+@app.post("/weather/current/batch")
+async def get_current_weather_batch(
+    request: Request,
+    batch: BatchRequest,
+    stream: bool = Query(False, description="Stream results as NDJSON as they complete"),
+    fields: Optional[str] = Query(None, description="Comma-separated output fields, e.g. current.temp_c")
+):
+    """Get current weather for many cities and/or "lat,lon" pairs at once"""
+    if not WEATHER_API_KEY:
+        raise HTTPException(status_code=500, detail="API key not configured")
+    
+    # Duplicate inputs share one result
+    locations = list(dict.fromkeys(location.strip() for location in batch.locations))
+    if not locations or not all(locations):
+        raise HTTPException(status_code=400, detail="Locations must be non-empty")
+    if len(locations) > BATCH_MAX_LOCATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_MAX_LOCATIONS} locations per batch"
+        )
+    
+    project = select_projection(CURRENT_WEATHER, fields)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    if stream:
+        async def resolve(location):
+            status, body = await resolve_current(location, semaphore, project)
+            return location, status, body
+        
+        async def stream_results():
+            for next_result in asyncio.as_completed([resolve(loc) for loc in locations]):
+                location, status, body = await next_result
+                yield dumps({"location": location, "status": status, "data": body}) + b"\n"
+        
+        return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+    
+    outcomes = await asyncio.gather(*(resolve_current(loc, semaphore, project) for loc in locations))
+    results = {}
+    errors = {}
+    for location, (status, body) in zip(locations, outcomes):
+        if status == 200:
+            results[location] = body
+        else:
+            errors[location] = {"status": status, **body}
+    
+    return weather_response(request, {"results": results, "errors": errors})
+
+async def poll_subscription(location: str):
+    """Current weather for a subscribed location, as (status, body)"""
+    return await resolve_current(location, subscription_polls, CURRENT_WEATHER)
+
+# One shared poller per subscribed location, fanned out to every client
+subscription_polls = asyncio.Semaphore(BATCH_CONCURRENCY)
+subscription_hub = SubscriptionHub(poll_subscription)
+
+REGISTRY.callback(
+    "subscription_clients", "Connected subscription clients", "gauge",
+    lambda: {(): subscription_hub.subscribers}
+)
+REGISTRY.callback(
+    "subscription_pollers", "Locations polled for subscribers", "gauge",
+    lambda: {(): subscription_hub.pollers}
+)
+
+@app.get("/weather/subscribe")
+async def subscribe_weather(
+    location: List[str] = Query(..., description="City or \"lat,lon\"; repeat for several locations")
+):
+    """Server-Sent Events stream of current weather for the given locations.
+
+    Each location starts with a ``snapshot`` event; later ``update`` events
+    carry a JSON merge patch of what changed.
+    """
+    if not WEATHER_API_KEY:
+        raise HTTPException(status_code=500, detail="API key not configured")
+    
+    locations = list(dict.fromkeys(normalize_location(loc) for loc in location))
+    if not all(locations):
+        raise HTTPException(status_code=400, detail="Locations must be non-empty")
+    if len(locations) > SUBSCRIPTION_MAX_LOCATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {SUBSCRIPTION_MAX_LOCATIONS} locations per subscription"
+        )
+    if subscription_hub.full():
+        raise HTTPException(status_code=503, detail="Too many subscribers")
+    
+    async def events():
+        subscriber = subscription_hub.subscribe(locations)
+        try:
+            yield "retry: 5000\n\n"
+            while not subscriber.closed:
+                batch = await subscriber.next_events(SUBSCRIPTION_HEARTBEAT_SECONDS)
+                if not batch:
+                    yield ": keep-alive\n\n"
+                    continue
+                for loc, kind, payload in batch:
+                    data = dumps({"location": loc, "data": payload}).decode()
+                    yield f"event: {kind}\ndata: {data}\n\n"
+        finally:
+            subscription_hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/weather/forecast")
 async def get_weather_forecast(
+    request: Request,
     city: Optional[str] = Query(None, description="City name"), 
     lat: Optional[float] = Query(None, description="Latitude"),
     lon: Optional[float] = Query(None, description="Longitude"),
-    days: int = Query(5, ge=1, le=10)
+    days: int = Query(5, ge=1, le=10),
+    fields: Optional[str] = Query(None, description="Comma-separated output fields, e.g. current.temp_c"),
+    resolution: int = Query(3, description="Hours between hourly entries (1, 3 or 6)"),
+    response_format: str = Query(
+        "objects", alias="format", pattern="^(objects|columnar)$",
+        description="'columnar' returns hourly data as parallel arrays"
+    )
 ):
     """Get weather forecast for a specific city or coordinates"""
     if not WEATHER_API_KEY:
         raise HTTPException(status_code=500, detail="API key not configured")
     
+    if resolution not in FORECAST_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail="Resolution must be 1, 3 or 6 hours")
+    
+    project = select_projection(FORECAST, fields)
+    
     # Determine location parameter
-    if lat is not None and lon is not None:
-        location = f"{lat},{lon}"
-    elif city:
-        location = city
-    else:
+    use_coordinates = lat is not None and lon is not None
+    if not use_coordinates and not city:
         raise HTTPException(status_code=400, detail="Either city or coordinates must be provided")
     
     try:
-        url = f"{WEATHER_API_BASE_URL}/forecast.json"
-        params = {
-            "key": WEATHER_API_KEY,
-            "q": location,
-            "days": days,
-            "aqi": "yes",
-            "alerts": "no"
-        }
-        
-        logger.info(f"Fetching forecast for: {location}")
-        response = requests.get(url, params=params, timeout=15)
+        if use_coordinates:
+            data = await fetch_spatial(
+                "forecast.json", lat, lon, "forecast", "Location not found",
+                days=days, aqi="yes", alerts="no"
+            )
+        else:
+            data = await fetch_cached(
+                "forecast.json", city, "forecast", "Location not found",
+                days=days, aqi="yes", alerts="no"
+            )
         
-        if response.status_code == 400:
-            raise HTTPException(status_code=404, detail="Location not found")
+        with phase("format"):
+            formatted_data = project(data, hour_step=resolution)
+            if response_format == "columnar":
+                formatted_data = to_columnar(formatted_data)
+        if use_coordinates:
+            formatted_data["query"] = {"lat": lat, "lon": lon}
         
-        response.raise_for_status()
-        data = response.json()
+        return weather_response(request, formatted_data, data_max_age())
         
-        # Enhanced forecast formatting
-        formatted_data = {
-            "location": {
-                "name": data["location"]["name"],
-                "region": data["location"]["region"],
-                "country": data["location"]["country"],
-                "lat": data["location"]["lat"],
-                "lon": data["location"]["lon"],
-                "localtime": data["location"]["localtime"]
-            },
-            "current": {
-                "temp_c": data["current"]["temp_c"],
-                "temp_f": data["current"]["temp_f"],
-                "condition": {
-                    "text": data["current"]["condition"]["text"],
-                    "icon": data["current"]["condition"]["icon"],
-                    "code": data["current"]["condition"]["code"]
-                },
-                "humidity": data["current"]["humidity"],
-                "wind_kph": data["current"]["wind_kph"],
-                "uv": data["current"]["uv"]
-            },
-            "forecast": {
-                "forecastday": [
-                    {
-                        "date": day["date"],
-                        "day": {
-                            "maxtemp_c": day["day"]["maxtemp_c"],
-                            "maxtemp_f": day["day"]["maxtemp_f"],
-                            "mintemp_c": day["day"]["mintemp_c"],
-                            "mintemp_f": day["day"]["mintemp_f"],
-                            "avgtemp_c": day["day"]["avgtemp_c"],
-                            "avgtemp_f": day["day"]["avgtemp_f"],
-                            "condition": {
-                                "text": day["day"]["condition"]["text"],
-                                "icon": day["day"]["condition"]["icon"],
-                                "code": day["day"]["condition"]["code"]
-                            },
-                            "maxwind_kph": day["day"]["maxwind_kph"],
-                            "totalprecip_mm": day["day"]["totalprecip_mm"],
-                            "avghumidity": day["day"]["avghumidity"],
-                            "daily_will_it_rain": day["day"]["daily_will_it_rain"],
-                            "daily_chance_of_rain": day["day"]["daily_chance_of_rain"],
-                            "uv": day["day"]["uv"]
-                        },
-                        "astro": {
-                            "sunrise": day["astro"]["sunrise"],
-                            "sunset": day["astro"]["sunset"],
-                            "moonrise": day["astro"]["moonrise"],
-                            "moonset": day["astro"]["moonset"],
-                            "moon_phase": day["astro"]["moon_phase"]
-                        },
-                        "hour": [
-                            {
-                                "time": hour["time"],
-                                "temp_c": hour["temp_c"],
-                                "temp_f": hour["temp_f"],
-                                "condition": {
-                                    "text": hour["condition"]["text"],
-                                    "icon": hour["condition"]["icon"],
-                                    "code": hour["condition"]["code"]
-                                },
-                                "wind_kph": hour["wind_kph"],
-                                "humidity": hour["humidity"],
-                                "feelslike_c": hour["feelslike_c"],
-                                "feelslike_f": hour["feelslike_f"],
-                                "will_it_rain": hour["will_it_rain"],
-                                "chance_of_rain": hour["chance_of_rain"]
-                            } for hour in day["hour"][::3]  # Every 3 hours
-                        ]
-                    } for day in data["forecast"]["forecastday"]
-                ]
-            }
-        }
-        
-        return formatted_data
-        
-    except requests.Timeout:
+    except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Weather service timeout")
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Request error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch forecast data")
 
+def seconds_until_midnight(tz_id: Optional[str] = None) -> int:
+    """Seconds until the next midnight in ``tz_id`` (server time if None or unknown)"""
+    try:
+        tz = ZoneInfo(tz_id) if tz_id else None
+    except (ZoneInfoNotFoundError, ValueError):
+        tz = None
+    now = datetime.now(tz)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), now.tzinfo)
+    return max(0, int((midnight - now).total_seconds()))
+
+async def fetch_history_day(city: str, date: str, semaphore: asyncio.Semaphore):
+    """Fetch one day of history, returning (data, status) instead of raising"""
+    async with semaphore:
+        try:
+            data = await fetch_cached(
+                "history.json", city, "history", "No historical data available", dt=date
+            )
+        except HTTPException as e:
+            if e.status_code == 503:
+                # Upstream refused (open circuit or exhausted budget), not a failure of this day
+                retry_after = int(e.headers["Retry-After"])
+                return None, {
+                    "date": date, "status": "upstream_unavailable", "detail": e.detail,
+                    "retry_after": retry_after
+                }
+            status = "unavailable" if e.status_code == 404 else "error"
+            return None, {"date": date, "status": status, "detail": e.detail}
+        except httpx.TimeoutException:
+            return None, {"date": date, "status": "timeout", "detail": "Weather service timeout"}
+        except httpx.HTTPError as e:
+            logger.error(f"Request error: {str(e)}")
+            return None, {"date": date, "status": "error", "detail": "Failed to fetch history data"}
+    
+    if not data.get("forecast", {}).get("forecastday"):
+        return None, {"date": date, "status": "unavailable", "detail": "No historical data available"}
+    return data, {"date": date, "status": "ok"}
+
 @app.get("/weather/history")
 async def get_weather_history(
+    request: Request,
     city: str = Query(..., description="City name"), 
     days: int = Query(3, ge=1, le=7)
 ):
@@ -354,136 +874,173 @@ async def get_weather_history(
     if not WEATHER_API_KEY:
         raise HTTPException(status_code=500, detail="API key not configured")
     
-    try:
-        history_data = []
-        
-        for i in range(days):
-            # Calculate date for each day in the past
-            date = (datetime.now() - timedelta(days=i+1)).strftime('%Y-%m-%d')
-            
-            url = f"{WEATHER_API_BASE_URL}/history.json"
-            params = {
-                "key": WEATHER_API_KEY,
-                "q": city,
-                "dt": date
-            }
-            
-            logger.info(f"Fetching history for {city} on {date}")
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 400:
-                continue  # Skip this date if not available
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            # Format historical data
-            if data.get("forecast", {}).get("forecastday"):
-                day_data = data["forecast"]["forecastday"][0]
-                formatted_day = {
-                    "date": day_data["date"],
-                    "day": {
-                        "maxtemp_c": day_data["day"]["maxtemp_c"],
-                        "maxtemp_f": day_data["day"]["maxtemp_f"],
-                        "mintemp_c": day_data["day"]["mintemp_c"],
-                        "mintemp_f": day_data["day"]["mintemp_f"],
-                        "avgtemp_c": day_data["day"]["avgtemp_c"],
-                        "avgtemp_f": day_data["day"]["avgtemp_f"],
-                        "condition": {
-                            "text": day_data["day"]["condition"]["text"],
-                            "icon": day_data["day"]["condition"]["icon"],
-                            "code": day_data["day"]["condition"]["code"]
-                        },
-                        "maxwind_kph": day_data["day"]["maxwind_kph"],
-                        "totalprecip_mm": day_data["day"]["totalprecip_mm"],
-                        "avghumidity": day_data["day"]["avghumidity"],
-                        "uv": day_data["day"]["uv"]
-                    }
-                }
-                history_data.append(formatted_day)
-        
-        if not history_data:
-            raise HTTPException(status_code=404, detail="No historical data available")
+    # Calculate the dates in the past, most recent first
+    dates = [
+        (datetime.now() - timedelta(days=i+1)).strftime('%Y-%m-%d')
+        for i in range(days)
+    ]
+    
+    # Fetch all days concurrently; completed days are usually cache hits
+    semaphore = asyncio.Semaphore(HISTORY_CONCURRENCY)
+    results = await asyncio.gather(
+        *(fetch_history_day(city, date, semaphore) for date in dates)
+    )
+    
+    history_data = []
+    day_status = []
+    data = None
+    for day_result, status in results:
+        day_status.append(status)
+        if day_result is None:
+            continue
+        data = day_result
         
-        return {
-            "location": {
-                "name": data["location"]["name"],
-                "region": data["location"]["region"],
-                "country": data["location"]["country"]
-            },
-            "history": history_data
+        # Format historical data
+        with phase("format"):
+            formatted_day = HISTORY_DAY(day_result["forecast"]["forecastday"][0])
+        history_data.append(formatted_day)
+    
+    if not history_data:
+        statuses = {status["status"] for status in day_status}
+        if "upstream_unavailable" in statuses:
+            raise service_unavailable(max(
+                status.get("retry_after", 0) for status in day_status
+            ))
+        if "timeout" in statuses:
+            raise HTTPException(status_code=504, detail="Weather service timeout")
+        if "error" in statuses:
+            raise HTTPException(status_code=500, detail="Failed to fetch history data")
+        raise HTTPException(status_code=404, detail="No historical data available")
+    
+    partial = len(history_data) < len(dates)
+    if partial:
+        # Failed days may be available on the next request
+        max_age = 0
+    else:
+        # "Last N days" moves to a new window at midnight, both for the
+        # server (which picks the dates) and for the location itself
+        tz_id = data.get("location", {}).get("tz_id")
+        max_age = min(data_max_age(), seconds_until_midnight(), seconds_until_midnight(tz_id))
+    
+    with phase("format"):
+        location = HISTORY_LOCATION(data)
+    return weather_response(request, {
+        "location": location,
+        "history": history_data,
+        "days": day_status,
+        "partial": partial
+    }, max_age)
+
+@app.get("/weather/history/range")
+async def get_weather_history_range(
+    request: Request,
+    city: str = Query(..., description="City name"),
+    start: date = Query(..., description="First day (YYYY-MM-DD)"),
+    end: date = Query(..., description="Last day (YYYY-MM-DD)"),
+    window: int = Query(7, ge=1, le=365, description="Rolling average window (days)"),
+    series: bool = Query(True, description="Include daily values, rolling averages and anomalies")
+):
+    """Statistics over archived history for a date range (no upstream calls)"""
+    # NumPy is only imported when first needed; it dominates import time
+    from climate import summarize
+    
+    if history_archive is None:
+        raise HTTPException(status_code=404, detail="History archive is disabled")
+    if end < start:
+        raise HTTPException(status_code=400, detail="End date must not be before start date")
+    if (end - start).days + 1 > HISTORY_RANGE_MAX_DAYS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {HISTORY_RANGE_MAX_DAYS} days per query"
+        )
+    
+    place, rows = await history_archive.load_range(
+        canonical_location(city), start.isoformat(), end.isoformat()
+    )
+    if place is None:
+        raise HTTPException(status_code=404, detail="No archived history for this location")
+    
+    with phase("format"):
+        formatted_data = {
+            "location": HISTORY_LOCATION({"location": place}),
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            **summarize(rows, start, end, window, series)
         }
-        
-    except requests.Timeout:
-        raise HTTPException(status_code=504, detail="Weather service timeout")
-    except requests.RequestException as e:
-        logger.error(f"Request error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to fetch history data")
+    return weather_response(request, formatted_data, CACHE_TTLS["history"])
+
+# Resolved location ("lat,lon") per client network
+ip_locations = TTLCache(max_entries=IP_LOCATION_MAX_ENTRIES, stale_ttl=0)
+
+REGISTRY.callback(
+    "ip_location_cache_events_total", "Client network to location lookups", "counter",
+    lambda: {("hit",): ip_locations.hits, ("miss",): ip_locations.misses},
+    ("event",)
+)
+
+async def resolve_ip_location(ip: str, network: str) -> str:
+    """Look up where an IP is and cache it for the IP's whole network.
+
+    The upstream answer also carries current weather, which is stored under
+    the resolved location so the following cache lookup is a hit.
+    """
+    async def resolve():
+        logger.info(f"Resolving location for network {network}")
+        with phase("upstream"):
+            response = await governor.get("current.json", {"q": ip, "aqi": "yes"})
+        check_upstream_status(response, "Unable to detect location")
+        with phase("decode"):
+            data = loads(response.content)
+        place = data["location"]
+        location = f"{place['lat']},{place['lon']}"
+        params = {"aqi": "yes"}
+        store_entry(
+            make_key("current.json", location, **params), "current.json", params, data,
+            CACHE_TTLS["current"], size=len(response.content)
+        )
+        ip_locations.set(network, location, IP_LOCATION_TTL)
+        return location
+
+    return await upstream_calls.do(("ip_location", network), resolve)
 
 @app.get("/weather/location")
-async def get_weather_by_location(ip: Optional[str] = Query(None, description="IP address for location detection")):
+async def get_weather_by_location(
+    request: Request,
+    ip: Optional[str] = Query(None, description="IP address for location detection"),
+    fields: Optional[str] = Query(None, description="Comma-separated output fields, e.g. current.temp_c")
+):
     """Get weather for current location (IP-based)"""
     if not WEATHER_API_KEY:
         raise HTTPException(status_code=500, detail="API key not configured")
     
+    project = select_projection(CURRENT_WEATHER, fields)
+    address = parse_ip(ip) if ip else client_ip(request)
+    if ip and address is None:
+        raise HTTPException(status_code=400, detail="Invalid IP address")
     try:
-        # Use IP-based location detection
-        location_query = ip if ip else "auto:ip"
-        
-        url = f"{WEATHER_API_BASE_URL}/current.json"
-        params = {
-            "key": WEATHER_API_KEY,
-            "q": location_query,
-            "aqi": "yes"
-        }
-        
-        logger.info("Fetching weather by IP location")
-        response = requests.get(url, params=params, timeout=10)
+        if address is None or not address.is_global:
+            # Private or local callers: let WeatherAPI use the server's address
+            location = "auto:ip"
+        else:
+            network = network_key(address)
+            entry = ip_locations.get(network)
+            location = entry.value if entry else await resolve_ip_location(str(address), network)
         
-        if response.status_code == 400:
-            raise HTTPException(status_code=404, detail="Unable to detect location")
+        data = await fetch_cached(
+            "current.json", location, "current", "Unable to detect location", aqi="yes"
+        )
         
-        response.raise_for_status()
-        data = response.json()
+        # Use same formatting as current weather endpoint; the location depends on the caller
+        with phase("format"):
+            formatted_data = project(data)
+        return weather_response(
+            request, formatted_data, data_max_age(CACHE_TTLS["current"]), private=True
+        )
         
-        # Use same formatting as current weather endpoint
-        formatted_data = {
-            "location": {
-                "name": data["location"]["name"],
-                "region": data["location"]["region"],
-                "country": data["location"]["country"],
-                "lat": data["location"]["lat"],
-                "lon": data["location"]["lon"],
-                "localtime": data["location"]["localtime"],
-                "tz_id": data["location"]["tz_id"]
-            },
-            "current": {
-                "temp_c": data["current"]["temp_c"],
-                "temp_f": data["current"]["temp_f"],
-                "feelslike_c": data["current"]["feelslike_c"],
-                "feelslike_f": data["current"]["feelslike_f"],
-                "condition": {
-                    "text": data["current"]["condition"]["text"],
-                    "icon": data["current"]["condition"]["icon"],
-                    "code": data["current"]["condition"]["code"]
-                },
-                "humidity": data["current"]["humidity"],
-                "wind_kph": data["current"]["wind_kph"],
-                "wind_mph": data["current"]["wind_mph"],
-                "wind_dir": data["current"]["wind_dir"],
-                "wind_degree": data["current"]["wind_degree"],
-                "pressure_mb": data["current"]["pressure_mb"],
-                "visibility_km": data["current"]["vis_km"],
-                "uv": data["current"]["uv"]
-            },
-            "air_quality": data.get("current", {}).get("air_quality", {})
-        }
-        
-        return formatted_data
-        
-    except requests.Timeout:
+    except UpstreamUnavailable as e:
+        raise service_unavailable(e.retry_after)
+    except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Weather service timeout")
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Request error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch location-based weather")
 
@@ -497,6 +1054,43 @@ async def health_check():
         "api_key_configured": bool(WEATHER_API_KEY)
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for this worker"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+profiler = SamplingProfiler()
+
+def check_admin_token(request: Request):
+    """Admin endpoints need ``Authorization: Bearer <ADMIN_TOKEN>``"""
+    if not ADMIN_TOKEN:
+        # Disabled entirely when no token is configured
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.get("/admin/profile", include_in_schema=False)
+async def admin_profile(
+    request: Request,
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(PROFILE_DEFAULT_INTERVAL_MS, ge=1, le=1000)
+):
+    """Sample the event loop for ``seconds`` and return collapsed stacks.
+
+    Render with flamegraph.pl or load into speedscope. Requests keep being
+    served while the profile is recorded.
+    """
+    check_admin_token(request)
+    loop_thread = threading.get_ident()
+    try:
+        profile = await asyncio.get_running_loop().run_in_executor(
+            None, profiler.run, loop_thread, seconds, interval_ms / 1000
+        )
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return PlainTextResponse(profile, headers={"Cache-Control": "no-store"})
+
 # Additional endpoint for API status
 @app.get("/status")
 async def api_status():
@@ -509,16 +1103,33 @@ async def api_status():
             "Current weather by city/coordinates",
             "Weather forecasting (1-10 days)",
             "Historical weather data (1-7 days)",
+            "Archived history ranges with climate statistics",
             "IP-based location detection",
             "Air quality information",
             "Astronomical data (sunrise/sunset)"
         ],
-        "endpoints": 7,
-        "last_updated": "2025-01-20"
+        "endpoints": len([route for route in app.routes if isinstance(route, APIRoute)]),
+        "last_updated": "2025-01-20",
+        "cache": weather_cache.stats(),
+        "shared_cache": shared_cache.stats() if shared_cache is not None else None,
+        "location_store": location_store.stats(),
+        "subscriptions": subscription_hub.stats(),
+        "ip_locations": ip_locations.stats(),
+        "location_index": location_index.stats(),
+        "snapshot": snapshot.stats(),
+        "profiler": profiler.stats(),
+        "history_archive": {
+            **history_archive.stats(), **(await history_archive.count())
+        } if history_archive is not None else None,
+        "upstream_calls": upstream_calls.stats(),
+        "prefetch": prefetcher.stats(),
+        "governor": governor.stats()
     }
 
 
 if __name__ == "__main__":
+    import uvicorn
+    
     port = int(os.getenv("PORT", 8000))
     uvicorn.run(
         app, 
@@ -0,0 +1,211 @@
+"""Popularity-driven background prefetching of hot cache entries."""
+import asyncio
+import heapq
+import logging
+import math
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+# Number of most popular entries kept warm
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", 50))
+# Maximum upstream calls the scheduler may spend per minute
+PREFETCH_BUDGET_PER_MINUTE = int(os.getenv("PREFETCH_BUDGET_PER_MINUTE", 30))
+# Refresh entries this many seconds before they expire (plus jitter)
+PREFETCH_LEAD_SECONDS = float(os.getenv("PREFETCH_LEAD_SECONDS", 60))
+PREFETCH_JITTER_SECONDS = float(os.getenv("PREFETCH_JITTER_SECONDS", 15))
+PREFETCH_INTERVAL_SECONDS = float(os.getenv("PREFETCH_INTERVAL_SECONDS", 10))
+# Popularity halves every this many seconds without requests
+PREFETCH_HALF_LIFE_SECONDS = float(os.getenv("PREFETCH_HALF_LIFE_SECONDS", 1800))
+PREFETCH_MAX_TRACKED = int(os.getenv("PREFETCH_MAX_TRACKED", 5000))
+# Cities that start out popular (the frontend's default city)
+PREFETCH_SEED_CITIES = [
+    city.strip() for city in os.getenv("PREFETCH_SEED_CITIES", "Pune").split(",") if city.strip()
+]
+
+
+class PopularityTracker:
+    """Exponentially decaying request counter per key.
+
+    Scores are stored relative to a fixed epoch, so recording a hit is O(1)
+    and decaying never touches the other keys.
+    """
+
+    def __init__(self, half_life: float = PREFETCH_HALF_LIFE_SECONDS,
+                 max_tracked: int = PREFETCH_MAX_TRACKED):
+        self.decay = math.log(2) / half_life
+        self.max_tracked = max_tracked
+        self._epoch = time.time()
+        self._scores: Dict[Hashable, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._scores
+
+    def _weight(self, now: float) -> float:
+        return math.exp(self.decay * (now - self._epoch))
+
+    def record(self, key: Hashable, weight: float = 1.0):
+        now = time.time()
+        if now - self._epoch > 50 / self.decay:
+            self._rebase(now)
+        self._scores[key] = self._scores.get(key, 0.0) + weight * self._weight(now)
+        if len(self._scores) > self.max_tracked:
+            self._prune()
+
+    def discard(self, key: Hashable):
+        self._scores.pop(key, None)
+
+    def move(self, old: Hashable, new: Hashable):
+        """Add ``old``'s score to ``new`` and stop tracking ``old``"""
+        score = self._scores.pop(old, 0.0)
+        if score:
+            self._scores[new] = self._scores.get(new, 0.0) + score
+
+    def score(self, key: Hashable) -> float:
+        return self._scores.get(key, 0.0) / self._weight(time.time())
+
+    def top(self, n: int) -> List[Hashable]:
+        return heapq.nlargest(n, self._scores, key=self._scores.__getitem__)
+
+    def _rebase(self, now: float):
+        # Keep scaled scores from overflowing
+        factor = self._weight(now)
+        self._scores = {key: score / factor for key, score in self._scores.items()}
+        self._epoch = now
+
+    def _prune(self):
+        keep = self.top(self.max_tracked // 2)
+        self._scores = {key: self._scores[key] for key in keep}
+
+
+class PrefetchScheduler:
+    """Refreshes the top-N popular entries shortly before they expire.
+
+    ``refresh(key, target)`` performs the upstream fetch for a key and
+    ``expires_at(key)`` returns the cached entry's expiry (None if missing).
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[Hashable, tuple], Awaitable],
+        expires_at: Callable[[Hashable], Optional[float]],
+        top_n: int = PREFETCH_TOP_N,
+        budget_per_minute: int = PREFETCH_BUDGET_PER_MINUTE,
+        lead_seconds: float = PREFETCH_LEAD_SECONDS,
+        jitter_seconds: float = PREFETCH_JITTER_SECONDS,
+        interval: float = PREFETCH_INTERVAL_SECONDS,
+    ):
+        self.refresh = refresh
+        self.expires_at = expires_at
+        self.top_n = top_n
+        self.budget_per_minute = budget_per_minute
+        self.lead_seconds = lead_seconds
+        self.jitter_seconds = jitter_seconds
+        self.interval = interval
+        self.popularity = PopularityTracker()
+        self._targets: Dict[Hashable, tuple] = {}
+        self._window_start = 0.0
+        self._window_calls = 0
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.skipped_budget = 0
+
+    def record(self, key: Hashable, target: tuple, weight: float = 1.0):
+        """Count a request for ``key``; ``target`` holds the args to refresh it"""
+        self.popularity.record(key, weight)
+        self._targets[key] = target
+        if len(self._targets) > self.popularity.max_tracked:
+            self._targets = {k: t for k, t in self._targets.items() if k in self.popularity}
+
+    def forget(self, key: Hashable):
+        """Stop prefetching ``key`` (e.g. the location does not exist)"""
+        self.popularity.discard(key)
+        self._targets.pop(key, None)
+
+    def rekey(self, old: Hashable, new: Hashable, target: tuple):
+        """Track ``old``'s popularity under ``new`` (e.g. its canonical key)"""
+        self.popularity.move(old, new)
+        self._targets.pop(old, None)
+        self._targets[new] = target
+
+    def _take_budget(self, now: float) -> bool:
+        if now - self._window_start >= 60:
+            self._window_start = now
+            self._window_calls = 0
+        if self._window_calls >= self.budget_per_minute:
+            return False
+        self._window_calls += 1
+        return True
+
+    def due(self, now: Optional[float] = None) -> List[Hashable]:
+        """Popular keys that are missing or expire within the lead time"""
+        now = time.time() if now is None else now
+        due = []
+        for key in self.popularity.top(self.top_n):
+            expires_at = self.expires_at(key)
+            lead = self.lead_seconds + random.uniform(0, self.jitter_seconds)
+            if expires_at is None or expires_at - now <= lead:
+                due.append(key)
+        return due
+
+    async def run_once(self):
+        now = time.time()
+        due = self.due(now)
+        refreshes = []
+        for key in due:
+            target = self._targets.get(key)
+            if target is None:
+                continue
+            if not self._take_budget(now):
+                self.skipped_budget += len(due) - len(refreshes)
+                break
+            refreshes.append(self._refresh(key, target))
+        if refreshes:
+            await asyncio.gather(*refreshes)
+
+    async def _refresh(self, key: Hashable, target: tuple):
+        try:
+            await self.refresh(key, target)
+            self.refreshes += 1
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Prefetch failed for {key}: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval + random.uniform(0, self.jitter_seconds / 4))
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Prefetch cycle failed: {str(e)}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Prefetch scheduler started (top {self.top_n}, "
+                        f"{self.budget_per_minute} calls/min)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self.popularity),
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "skipped_budget": self.skipped_budget,
+        }
@@ -0,0 +1,75 @@
+"""On-demand sampling profiler producing collapsed stacks for flame graphs."""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 60))
+PROFILE_DEFAULT_INTERVAL_MS = float(os.getenv("PROFILE_DEFAULT_INTERVAL_MS", 5))
+
+
+class ProfilerBusy(Exception):
+    """A profile is already being recorded"""
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack from a background thread.
+
+    The profiled code is not instrumented; each sample only walks the
+    current frame chain, so the overhead is bounded by the sampling rate.
+    Output is in the collapsed format read by flamegraph.pl and speedscope
+    (``outer;inner;leaf count`` per line). Only one profile runs at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.profiles = 0
+        self.samples = 0
+
+    def run(self, thread_id: int, seconds: float, interval: float) -> str:
+        """Sample ``thread_id`` for ``seconds`` (blocking; call from a worker thread)"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            stacks = self._sample(thread_id, seconds, interval)
+        finally:
+            self._lock.release()
+        self.profiles += 1
+        self.samples += sum(stacks.values())
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def _sample(self, thread_id: int, seconds: float, interval: float) -> Counter:
+        stacks: Counter = Counter()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            frame: Optional[object] = sys._current_frames().get(thread_id)
+            if frame is None:
+                break
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            stacks[";".join(reversed(names))] += 1
+            time.sleep(interval)
+        return stacks
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": bool(ADMIN_TOKEN),
+            "running": self.running,
+            "profiles": self.profiles,
+            "samples": self.samples,
+        }
@@ -0,0 +1,333 @@
+"""Declarative response projections compiled into fast extractor functions.
+
+A projection spec is a nested dict describing the response shape. Leaves
+are dotted source paths (or ``Get`` for fields with a default) and ``Each``
+maps a spec over a list. Specs are compiled once, at import time, into a
+single generated function that builds the response as nested dict literals.
+Clients can request a subset of the output with ``fields=`` (dotted output
+paths, e.g. ``current.temp_c,current.condition.text``).
+"""
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+# Maximum number of distinct ``fields=`` selections compiled per projection
+MAX_SELECTIONS = 256
+
+
+class Get:
+    """Source path with a default used when any part of it is missing"""
+
+    __slots__ = ("path", "default")
+
+    def __init__(self, path: str, default=None):
+        self.path = path
+        self.default = default
+
+
+class Each:
+    """Apply ``spec`` to every item of the list at ``path``.
+
+    With ``step`` set, only every n-th item is kept; n is a keyword argument
+    of the compiled function named ``step`` (defaulting to ``default_step``).
+    """
+
+    __slots__ = ("path", "spec", "step", "default_step")
+
+    def __init__(self, path: str, spec: dict, step: Optional[str] = None, default_step: int = 1):
+        self.path = path
+        self.spec = spec
+        self.step = step
+        self.default_step = default_step
+
+
+Node = Union[str, Get, Each, dict]
+
+
+class UnknownFieldError(ValueError):
+    pass
+
+
+def _access(var: str, path: str, node: Node, consts: dict) -> str:
+    parts = path.split(".")
+    if not isinstance(node, Get):
+        return var + "".join(f"[{part!r}]" for part in parts)
+    name = f"_c{len(consts)}"
+    consts[name] = node.default
+    consts.setdefault("_EMPTY", {})
+    return (
+        var
+        + "".join(f".get({part!r}, _EMPTY)" for part in parts[:-1])
+        + f".get({parts[-1]!r}, {name})"
+    )
+
+
+def _generate(node: Node, var: str, depth: int, consts: dict, steps: dict) -> str:
+    if isinstance(node, dict):
+        items = ", ".join(
+            f"{key!r}: {_generate(child, var, depth, consts, steps)}"
+            for key, child in node.items()
+        )
+        return "{" + items + "}"
+    if isinstance(node, Each):
+        item = f"_v{depth}"
+        source = _access(var, node.path, node, consts)
+        if node.step:
+            steps[node.step] = node.default_step
+            source += f"[::{node.step}]"
+        body = _generate(node.spec, item, depth + 1, consts, steps)
+        return f"[{body} for {item} in {source}]"
+    path = node.path if isinstance(node, Get) else node
+    return _access(var, path, node, consts)
+
+
+def compile_spec(spec: dict, name: str = "projection",
+                 steps: Optional[dict] = None) -> Callable[..., dict]:
+    """Compile a projection spec into a function ``f(data, *, **steps) -> dict``.
+
+    ``steps`` declares step keywords the function accepts even when the spec
+    has no list using them (e.g. a ``fields=`` selection without hourly data).
+    """
+    consts: dict = {}
+    steps = dict(steps or {})
+    body = _generate(spec, "d", 0, consts, steps)
+    args = "".join(f", {step}={default!r}" for step, default in steps.items())
+    if args:
+        args = ", *" + args
+    source = f"def _{name}(d{args}):\n    return {body}\n"
+    namespace = dict(consts)
+    exec(compile(source, f"<projection {name}>", "exec"), namespace)
+    return namespace[f"_{name}"]
+
+
+def _prune(spec: dict, selections: Iterable[Tuple[str, ...]], prefix: str = "") -> dict:
+    """Keep only the parts of ``spec`` covered by the selected output paths"""
+    by_key: Dict[str, list] = {}
+    for selection in selections:
+        key = selection[0]
+        if key not in spec:
+            raise UnknownFieldError(f"Unknown field: {prefix}{key}")
+        by_key.setdefault(key, []).append(selection[1:])
+
+    pruned = {}
+    for key, node in spec.items():
+        if key not in by_key:
+            continue
+        rest = by_key[key]
+        if () in rest:
+            pruned[key] = node
+        elif isinstance(node, dict):
+            pruned[key] = _prune(node, rest, f"{prefix}{key}.")
+        elif isinstance(node, Each):
+            pruned[key] = Each(
+                node.path, _prune(node.spec, rest, f"{prefix}{key}."),
+                node.step, node.default_step
+            )
+        else:
+            raise UnknownFieldError(f"Unknown field: {prefix}{key}.{'.'.join(rest[0])}")
+    return pruned
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[Tuple[str, ...], ...]]:
+    """Parse a ``fields=`` value into sorted, de-duplicated path tuples"""
+    if not fields:
+        return None
+    paths = {tuple(path.strip().split(".")) for path in fields.split(",") if path.strip()}
+    if any("" in path for path in paths):
+        raise UnknownFieldError("Invalid field path")
+    return tuple(sorted(paths)) or None
+
+
+class Projection:
+    """A compiled projection plus its compiled ``fields=`` selections"""
+
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.spec = spec
+        self._full = compile_spec(spec, name)
+        self._selections: Dict[tuple, Callable[..., dict]] = {}
+
+    def __call__(self, data: dict, **steps) -> dict:
+        return self._full(data, **steps)
+
+    def select(self, fields: Optional[str] = None) -> Callable[..., dict]:
+        """Extractor for a ``fields=`` selection; raises UnknownFieldError"""
+        selection = parse_fields(fields)
+        if selection is None:
+            return self._full
+        extractor = self._selections.get(selection)
+        if extractor is None:
+            extractor = compile_spec(
+                _prune(self.spec, selection), self.name, self._full.__kwdefaults__
+            )
+            if len(self._selections) >= MAX_SELECTIONS:
+                self._selections.clear()
+            self._selections[selection] = extractor
+        return extractor
+
+
+# Response specs
+
+CONDITION = {
+    "text": "condition.text",
+    "icon": "condition.icon",
+    "code": "condition.code",
+}
+
+CURRENT_WEATHER = Projection("current_weather", {
+    "location": {
+        "name": "location.name",
+        "region": "location.region",
+        "country": "location.country",
+        "lat": "location.lat",
+        "lon": "location.lon",
+        "localtime": "location.localtime",
+        "tz_id": "location.tz_id",
+    },
+    "current": {
+        "temp_c": "current.temp_c",
+        "temp_f": "current.temp_f",
+        "feelslike_c": "current.feelslike_c",
+        "feelslike_f": "current.feelslike_f",
+        "condition": {
+            "text": "current.condition.text",
+            "icon": "current.condition.icon",
+            "code": "current.condition.code",
+        },
+        "humidity": "current.humidity",
+        "wind_kph": "current.wind_kph",
+        "wind_mph": "current.wind_mph",
+        "wind_dir": "current.wind_dir",
+        "wind_degree": "current.wind_degree",
+        "pressure_mb": "current.pressure_mb",
+        "pressure_in": "current.pressure_in",
+        "visibility_km": "current.vis_km",
+        "visibility_miles": "current.vis_miles",
+        "uv": "current.uv",
+        "gust_kph": Get("current.gust_kph", 0),
+        "gust_mph": Get("current.gust_mph", 0),
+    },
+    "air_quality": Get("current.air_quality", {}),
+})
+
+FORECAST_DAY = {
+    "maxtemp_c": "day.maxtemp_c",
+    "maxtemp_f": "day.maxtemp_f",
+    "mintemp_c": "day.mintemp_c",
+    "mintemp_f": "day.mintemp_f",
+    "avgtemp_c": "day.avgtemp_c",
+    "avgtemp_f": "day.avgtemp_f",
+    "condition": {
+        "text": "day.condition.text",
+        "icon": "day.condition.icon",
+        "code": "day.condition.code",
+    },
+    "maxwind_kph": "day.maxwind_kph",
+    "totalprecip_mm": "day.totalprecip_mm",
+    "avghumidity": "day.avghumidity",
+    "daily_will_it_rain": "day.daily_will_it_rain",
+    "daily_chance_of_rain": "day.daily_chance_of_rain",
+    "uv": "day.uv",
+}
+
+FORECAST_HOUR = {
+    "time": "time",
+    "temp_c": "temp_c",
+    "temp_f": "temp_f",
+    "condition": CONDITION,
+    "wind_kph": "wind_kph",
+    "humidity": "humidity",
+    "feelslike_c": "feelslike_c",
+    "feelslike_f": "feelslike_f",
+    "will_it_rain": "will_it_rain",
+    "chance_of_rain": "chance_of_rain",
+}
+
+FORECAST = Projection("forecast", {
+    "location": {
+        "name": "location.name",
+        "region": "location.region",
+        "country": "location.country",
+        "lat": "location.lat",
+        "lon": "location.lon",
+        "localtime": "location.localtime",
+    },
+    "current": {
+        "temp_c": "current.temp_c",
+        "temp_f": "current.temp_f",
+        "condition": {
+            "text": "current.condition.text",
+            "icon": "current.condition.icon",
+            "code": "current.condition.code",
+        },
+        "humidity": "current.humidity",
+        "wind_kph": "current.wind_kph",
+        "uv": "current.uv",
+    },
+    "forecast": {
+        "forecastday": Each("forecast.forecastday", {
+            "date": "date",
+            "day": FORECAST_DAY,
+            "astro": {
+                "sunrise": "astro.sunrise",
+                "sunset": "astro.sunset",
+                "moonrise": "astro.moonrise",
+                "moonset": "astro.moonset",
+                "moon_phase": "astro.moon_phase",
+            },
+            # Every 3 hours by default
+            "hour": Each("hour", FORECAST_HOUR, step="hour_step", default_step=3),
+        }),
+    },
+})
+
+HISTORY_LOCATION = Projection("history_location", {
+    "name": "location.name",
+    "region": "location.region",
+    "country": "location.country",
+})
+
+HISTORY_DAY = Projection("history_day", {
+    "date": "date",
+    "day": {
+        key: value for key, value in FORECAST_DAY.items()
+        if key not in ("daily_will_it_rain", "daily_chance_of_rain")
+    },
+})
+
+
+def to_columnar(forecast: dict) -> dict:
+    """Convert a projected forecast's hourly lists into parallel arrays.
+
+    Each day's ``hour`` becomes ``{field: [values...]}``; hourly conditions
+    are replaced by indexes into a shared top-level ``conditions`` table.
+    """
+    days = forecast.get("forecast", {}).get("forecastday")
+    if not days or "hour" not in days[0]:
+        return forecast
+
+    conditions: list = []
+    condition_index: dict = {}
+    columnar_days = []
+    for day in days:
+        hours = day["hour"]
+        columns = {}
+        for field in (hours[0] if hours else ()):
+            if field == "condition":
+                indexes = []
+                for hour in hours:
+                    condition = hour["condition"]
+                    key = tuple(condition.values())
+                    index = condition_index.get(key)
+                    if index is None:
+                        index = condition_index[key] = len(conditions)
+                        conditions.append(condition)
+                    indexes.append(index)
+                columns["condition"] = indexes
+            else:
+                columns[field] = [hour[field] for hour in hours]
+        columnar_days.append({**day, "hour": columns})
+
+    return {
+        **forecast,
+        "forecast": {**forecast["forecast"], "forecastday": columnar_days},
+        "conditions": conditions,
+    }
@@ -0,0 +1,170 @@
+"""Fast JSON responses with ETag revalidation, Cache-Control and compression."""
+import gzip
+import hashlib
+import json
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from timing import phase
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional compression
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 5))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+
+# Expiry times of the cached data used while handling the current request
+_data_expiry: ContextVar[Optional[list]] = ContextVar("data_expiry", default=None)
+# (age, reason) of last-known-good data served because upstream was unavailable
+_stale_data: ContextVar[Optional[list]] = ContextVar("stale_data", default=None)
+
+
+def dumps(payload) -> bytes:
+    """Serialize to compact JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data: bytes):
+    """Parse JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def note_expiry(expires_at: float):
+    """Record the expiry of data that contributes to the current response"""
+    expiries = _data_expiry.get()
+    if expiries is not None:
+        expiries.append(expires_at)
+
+
+def note_stale(age: float, reason: str):
+    """Record that the current response uses stale fallback data"""
+    stale = _stale_data.get()
+    if stale is not None:
+        stale.append((age, reason))
+
+
+def data_max_age(default: int = 0) -> int:
+    """Seconds until the stalest data used by the current request expires"""
+    expiries = _data_expiry.get()
+    if not expiries:
+        return default
+    return max(0, int(min(expiries) - time.time()))
+
+
+class FreshnessMiddleware:
+    """Gives each HTTP request its own data expiry and staleness records"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        expiry_token = _data_expiry.set([])
+        stale_token = _stale_data.set([])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _data_expiry.reset(expiry_token)
+            _stale_data.reset(stale_token)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        # Compressed representations carry an encoding suffix
+        candidate = candidate.strip('"').split("-", 1)[0]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def weather_response(
+    request: Request,
+    payload,
+    max_age: Optional[int] = None,
+    private: bool = False,
+) -> Response:
+    """JSON response with a strong ETag, 304 handling and compression.
+
+    ``max_age`` sets Cache-Control; None leaves caching headers off.
+    Responses built from stale fallback data are marked in the body and
+    headers and are not cacheable.
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    stale = _stale_data.get()
+    if stale:
+        age, reason = max(stale)
+        headers["Warning"] = '110 - "Response is Stale"'
+        headers["X-Data-Age"] = str(int(age))
+        if isinstance(payload, dict):
+            payload = {**payload, "stale": {"age_seconds": int(age), "reason": reason}}
+        if max_age is not None:
+            max_age = 0
+
+    with phase("serialize"):
+        body = dumps(payload)
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+    if max_age is not None:
+        headers["Cache-Control"] = f"{'private' if private else 'public'}, max-age={max_age}"
+
+    encoding = None
+    if len(body) >= COMPRESS_MIN_BYTES:
+        encoding = _choose_encoding(request.headers.get("accept-encoding", ""))
+    headers["ETag"] = f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        with phase("compress"):
+            if encoding == "br":
+                body = brotli.compress(body, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers["Content-Encoding"] = encoding
+
+    return Response(content=body, media_type="application/json", headers=headers)
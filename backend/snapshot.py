@@ -0,0 +1,117 @@
+"""Periodic on-disk snapshot of hot cache data for warm starts."""
+import asyncio
+import gzip
+import logging
+import os
+import tempfile
+import time
+from typing import Callable, Optional
+
+from responses import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+CACHE_SNAPSHOT_ENABLED = os.getenv("CACHE_SNAPSHOT_ENABLED", "true").lower() == "true"
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", "cache_snapshot.json.gz")
+CACHE_SNAPSHOT_INTERVAL = float(os.getenv("CACHE_SNAPSHOT_INTERVAL", 300))
+# Most recently used entries written per snapshot
+CACHE_SNAPSHOT_MAX_ENTRIES = int(os.getenv("CACHE_SNAPSHOT_MAX_ENTRIES", 500))
+# Entries fetched longer ago than this are not restored
+CACHE_SNAPSHOT_MAX_AGE = float(os.getenv("CACHE_SNAPSHOT_MAX_AGE", 24 * 3600))
+
+SNAPSHOT_VERSION = 1
+
+
+class CacheSnapshot:
+    """Writes ``collect()`` to a gzipped JSON file and feeds it to ``restore()``.
+
+    Files are replaced atomically, so a crash mid-write leaves the previous
+    snapshot intact. ``restore(state)`` returns the number of restored entries.
+    """
+
+    def __init__(
+        self,
+        collect: Callable[[], dict],
+        restore: Callable[[dict], int],
+        path: str = CACHE_SNAPSHOT_PATH,
+        interval: float = CACHE_SNAPSHOT_INTERVAL,
+    ):
+        self.collect = collect
+        self.restore = restore
+        self.path = path
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.saves = 0
+        self.restored = 0
+        self.last_save_seconds = 0.0
+
+    def load(self) -> int:
+        """Restore the last snapshot, if any (called once at startup)"""
+        try:
+            with open(self.path, "rb") as f:
+                state = loads(gzip.decompress(f.read()))
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, EOFError) as e:
+            logger.warning(f"Ignoring unreadable cache snapshot {self.path}: {str(e)}")
+            return 0
+        if state.get("version") != SNAPSHOT_VERSION:
+            logger.info("Ignoring cache snapshot from another version")
+            return 0
+        self.restored = self.restore(state)
+        logger.info(f"Restored {self.restored} cache entries from {self.path}")
+        return self.restored
+
+    def _write(self, state: dict):
+        body = gzip.compress(dumps(state), compresslevel=1)
+        # A unique temp file per write, since every worker snapshots to the same path
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    async def save(self):
+        start = time.perf_counter()
+        try:
+            state = {"version": SNAPSHOT_VERSION, "saved_at": time.time(), **self.collect()}
+            # Compression and disk I/O stay off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, self._write, state)
+        except Exception as e:
+            # Never let one bad snapshot stop the periodic task
+            logger.warning(f"Failed to write cache snapshot {self.path}: {str(e)}")
+            return
+        self.saves += 1
+        self.last_save_seconds = time.perf_counter() - start
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic task and write a final snapshot"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.save()
+
+    def stats(self) -> dict:
+        return {
+            "restored": self.restored,
+            "saves": self.saves,
+            "last_save_ms": round(self.last_save_seconds * 1000, 2),
+        }
@@ -0,0 +1,81 @@
+"""Spatial quantization of coordinates for cache sharing."""
+import math
+import os
+from typing import List, Tuple
+
+# Grid cell size and how far away a warm neighbouring cell may answer a query
+SPATIAL_CELL_KM = float(os.getenv("SPATIAL_CELL_KM", 2))
+SPATIAL_MAX_DISTANCE_KM = float(os.getenv("SPATIAL_MAX_DISTANCE_KM", SPATIAL_CELL_KM))
+
+KM_PER_DEGREE = 111.32
+EARTH_RADIUS_KM = 6371.0
+
+Cell = Tuple[float, float]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialGrid:
+    """Equal-area-ish lat/lon grid with cells of roughly ``cell_km`` on a side.
+
+    Rows have a fixed latitude step; the longitude step widens towards the
+    poles so cells stay about the same size on the ground.
+    """
+
+    def __init__(self, cell_km: float = SPATIAL_CELL_KM,
+                 max_distance_km: float = SPATIAL_MAX_DISTANCE_KM):
+        self.cell_km = cell_km
+        self.max_distance_km = max_distance_km
+        self.lat_step = cell_km / KM_PER_DEGREE
+
+    def _lon_step(self, row: int) -> float:
+        cos_lat = max(math.cos(math.radians(row * self.lat_step)), 0.01)
+        return self.cell_km / (KM_PER_DEGREE * cos_lat)
+
+    def _center(self, row: int, col: int) -> Cell:
+        lat = max(-90.0, min(90.0, row * self.lat_step))
+        lon = col * self._lon_step(row)
+        lon = (lon + 180.0) % 360.0 - 180.0
+        return round(lat, 4), round(lon, 4)
+
+    def _index(self, lat: float, lon: float) -> Tuple[int, int]:
+        row = round(lat / self.lat_step)
+        return row, round(lon / self._lon_step(row))
+
+    def cell(self, lat: float, lon: float) -> Cell:
+        """Center of the cell containing (lat, lon)"""
+        return self._center(*self._index(lat, lon))
+
+    def nearby_cells(self, lat: float, lon: float) -> List[Cell]:
+        """Neighbouring cell centers within ``max_distance_km``, nearest first.
+
+        The point's own cell is not included.
+        """
+        row, col = self._index(lat, lon)
+        own = self._center(row, col)
+        candidates = []
+        for d_row in (-1, 0, 1):
+            # Neighbouring rows have a different longitude step
+            n_row = row + d_row
+            n_col = round(lon / self._lon_step(n_row))
+            for d_col in (-1, 0, 1):
+                center = self._center(n_row, n_col + d_col)
+                if center == own:
+                    continue
+                distance = haversine_km(lat, lon, *center)
+                if distance <= self.max_distance_km:
+                    candidates.append((distance, center))
+        candidates.sort()
+        return [center for _, center in candidates]
+
+
+def cell_query(cell: Cell) -> str:
+    """Upstream "lat,lon" query for a cell center"""
+    return f"{cell[0]:.4f},{cell[1]:.4f}"
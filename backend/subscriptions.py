@@ -0,0 +1,229 @@
+"""Push updates for subscribed locations with one shared poller per location."""
+import asyncio
+import contextvars
+import logging
+import os
+import random
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds between polls of a subscribed location (reads go through the cache)
+SUBSCRIPTION_POLL_SECONDS = float(os.getenv("SUBSCRIPTION_POLL_SECONDS", 60))
+SUBSCRIPTION_HEARTBEAT_SECONDS = float(os.getenv("SUBSCRIPTION_HEARTBEAT_SECONDS", 15))
+SUBSCRIPTION_MAX_LOCATIONS = int(os.getenv("SUBSCRIPTION_MAX_LOCATIONS", 20))
+SUBSCRIPTION_MAX_CLIENTS = int(os.getenv("SUBSCRIPTION_MAX_CLIENTS", 10000))
+
+SNAPSHOT = "snapshot"
+UPDATE = "update"
+ERROR = "error"
+
+# Marks a removed key in a diff
+_MISSING = object()
+
+
+def merge_diff(old, new):
+    """JSON merge patch (RFC 7386) turning ``old`` into ``new``; None if equal"""
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None if old == new else new
+    diff = {}
+    for key, value in new.items():
+        previous = old.get(key, _MISSING)
+        if previous is _MISSING:
+            diff[key] = value
+        elif isinstance(previous, dict) and isinstance(value, dict):
+            nested = merge_diff(previous, value)
+            if nested is not None:
+                diff[key] = nested
+        elif previous != value:
+            diff[key] = value
+    for key in old.keys() - new.keys():
+        diff[key] = None
+    return diff or None
+
+
+class Subscriber:
+    """One client's mailbox: at most one pending event per location.
+
+    A slow client never builds up a backlog. If a new update arrives while
+    the previous one is still undelivered, the two are replaced by a full
+    snapshot, so skipping versions never breaks the diff chain.
+    """
+
+    def __init__(self, locations: List[str]):
+        self.locations = locations
+        self._pending: "OrderedDict[str, Tuple[str, dict]]" = OrderedDict()
+        self._synced: Set[str] = set()
+        self._wake = asyncio.Event()
+        self.closed = False
+        self.coalesced = 0
+
+    def offer(self, location: str, kind: str, payload: dict, snapshot: Optional[dict]):
+        if kind == UPDATE and (location not in self._synced or location in self._pending):
+            if location in self._pending:
+                self.coalesced += 1
+            kind, payload = SNAPSHOT, snapshot
+        self._pending[location] = (kind, payload)
+        self._wake.set()
+
+    def close(self):
+        self.closed = True
+        self._wake.set()
+
+    async def next_events(self, timeout: float) -> List[Tuple[str, str, dict]]:
+        """Wait for pending events; an empty list means the wait timed out"""
+        if not self._pending and not self.closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._wake.clear()
+        events = []
+        while self._pending:
+            location, (kind, payload) = self._pending.popitem(last=False)
+            if kind == SNAPSHOT:
+                self._synced.add(location)
+            elif kind == ERROR:
+                self._synced.discard(location)
+            events.append((location, kind, payload))
+        return events
+
+
+class LocationPoller:
+    """Polls one location and fans changes out to its subscribers"""
+
+    def __init__(self, location: str, hub: "SubscriptionHub"):
+        self.location = location
+        self.hub = hub
+        self.subscribers: Set[Subscriber] = set()
+        self.snapshot: Optional[dict] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        # Run outside the subscribing request's context so per-request
+        # state (freshness records) is not inherited by the long-lived task
+        self.task = contextvars.Context().run(asyncio.create_task, self._run())
+
+    def add(self, subscriber: Subscriber):
+        self.subscribers.add(subscriber)
+        if self.snapshot is not None:
+            subscriber.offer(self.location, SNAPSHOT, self.snapshot, self.snapshot)
+
+    async def _run(self):
+        first = True
+        while True:
+            try:
+                status, body = await self.hub.fetch(self.location)
+            except Exception as e:
+                logger.warning(f"Subscription poll failed for {self.location}: {str(e)}")
+                status, body = 500, {"detail": "Failed to fetch weather data"}
+            self.hub.polls += 1
+            if status == 200:
+                self._publish(body)
+            elif status in (400, 404):
+                # Invalid or unknown location: tell subscribers and stop polling it
+                for subscriber in self.subscribers:
+                    subscriber.offer(self.location, ERROR, {"status": status, **body}, None)
+                self.hub.remove_poller(self)
+                return
+            delay = self.hub.interval
+            if first:
+                # Spread pollers that started together across the interval
+                delay *= random.uniform(0.5, 1.0)
+                first = False
+            await asyncio.sleep(delay)
+
+    def _publish(self, snapshot: dict):
+        if self.snapshot is None:
+            kind, payload = SNAPSHOT, snapshot
+        else:
+            payload = merge_diff(self.snapshot, snapshot)
+            if payload is None:
+                return
+            kind = UPDATE
+        self.snapshot = snapshot
+        self.hub.published += 1
+        for subscriber in self.subscribers:
+            subscriber.offer(self.location, kind, payload, snapshot)
+
+
+class SubscriptionHub:
+    """Shares one poller per location between every subscribed client.
+
+    ``fetch(location)`` returns ``(status, body)`` for the location's
+    current weather; pollers start with the first subscriber of a location
+    and stop when the last one leaves.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Tuple[int, dict]]],
+        interval: float = SUBSCRIPTION_POLL_SECONDS,
+        max_clients: int = SUBSCRIPTION_MAX_CLIENTS,
+    ):
+        self.fetch = fetch
+        self.interval = interval
+        self.max_clients = max_clients
+        self._pollers: Dict[str, LocationPoller] = {}
+        self._subscribers: Set[Subscriber] = set()
+        self.polls = 0
+        self.published = 0
+        self.coalesced = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def pollers(self) -> int:
+        return len(self._pollers)
+
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_clients
+
+    def subscribe(self, locations: List[str]) -> Subscriber:
+        subscriber = Subscriber(locations)
+        self._subscribers.add(subscriber)
+        for location in locations:
+            poller = self._pollers.get(location)
+            if poller is None:
+                poller = self._pollers[location] = LocationPoller(location, self)
+                poller.start()
+            poller.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        self.coalesced += subscriber.coalesced
+        for location in subscriber.locations:
+            poller = self._pollers.get(location)
+            if poller is None:
+                continue
+            poller.subscribers.discard(subscriber)
+            if not poller.subscribers:
+                self.remove_poller(poller)
+
+    def remove_poller(self, poller: LocationPoller):
+        if self._pollers.get(poller.location) is poller:
+            del self._pollers[poller.location]
+        if poller.task is not None and poller.task is not asyncio.current_task():
+            poller.task.cancel()
+
+    async def close(self):
+        for subscriber in list(self._subscribers):
+            subscriber.close()
+        tasks = [poller.task for poller in self._pollers.values() if poller.task is not None]
+        self._pollers.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "pollers": len(self._pollers),
+            "polls": self.polls,
+            "published": self.published,
+            "coalesced": self.coalesced + sum(s.coalesced for s in self._subscribers),
+        }
@@ -0,0 +1,136 @@
+import asyncio
+
+import httpx
+import pytest
+
+from governor import (
+    BACKGROUND, HEDGED, LATENCY_WARMUP_SAMPLES, USER, CircuitBreaker, LatencyEstimate,
+    TokenBucket, UpstreamGovernor, UpstreamUnavailable
+)
+
+
+class FakeClient:
+    """Stands in for UpstreamClient; ``behaviours`` are applied to successive calls"""
+
+    def __init__(self, *behaviours):
+        self.behaviours = list(behaviours)
+        self.timeouts = {"current.json": 10.0}
+        self.calls = 0
+
+    async def get(self, path, params, timeout=None):
+        behaviour = self.behaviours[min(self.calls, len(self.behaviours) - 1)]
+        self.calls += 1
+        if isinstance(behaviour, BaseException):
+            raise behaviour
+        await asyncio.sleep(behaviour)
+        return httpx.Response(200)
+
+
+def make_governor(*behaviours, rate=100.0, burst=2.0) -> UpstreamGovernor:
+    governor = UpstreamGovernor(FakeClient(*behaviours))
+    governor.bucket = TokenBucket(rate, burst)
+    return governor
+
+
+# TokenBucket
+
+def test_bucket_rejects_when_empty():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+def test_bucket_keeps_reserve():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.try_acquire(reserve=1)
+    assert not bucket.try_acquire(reserve=1)
+
+
+def test_bucket_reserve_queues_waiters():
+    bucket = TokenBucket(rate=10, capacity=1)
+    assert bucket.reserve(max_wait=1) == 0
+    assert bucket.reserve(max_wait=1) == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve(max_wait=1) == pytest.approx(0.2, abs=0.01)
+    # Too long a wait takes nothing
+    assert bucket.reserve(max_wait=0.1) is None
+    assert bucket.reserve(max_wait=1) == pytest.approx(0.3, abs=0.01)
+
+
+# CircuitBreaker
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(threshold=2, cooldown=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_lets_one_probe_through_after_cooldown():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_unexpected_error_does_not_strand_probe():
+    governor = make_governor(RuntimeError("boom"))
+    governor.breaker = CircuitBreaker(threshold=1, cooldown=0)
+    governor.breaker.record_failure()
+    with pytest.raises(RuntimeError):
+        asyncio.run(governor.get("current.json", {}))
+    assert governor.breaker.state == CircuitBreaker.OPEN
+
+
+# UpstreamGovernor
+
+def test_user_calls_wait_for_tokens():
+    governor = make_governor(0, rate=100, burst=1)
+    governor.daily.limit = 0
+
+    async def run():
+        return await asyncio.gather(*(governor.get("current.json", {}) for _ in range(5)))
+
+    assert [response.status_code for response in asyncio.run(run())] == [200] * 5
+
+
+def test_background_calls_do_not_wait():
+    governor = make_governor(0, rate=0.001, burst=2)
+    asyncio.run(governor.get("current.json", {}, BACKGROUND))
+    with pytest.raises(UpstreamUnavailable) as error:
+        asyncio.run(governor.get("current.json", {}, BACKGROUND))
+    assert error.value.reason == "rate_limited"
+
+
+def test_timeout_backs_off_estimate():
+    estimate = LatencyEstimate()
+    for _ in range(LATENCY_WARMUP_SAMPLES):
+        estimate.observe(0.03)
+    estimate.back_off(2.0)
+    assert estimate.timeout(ceiling=10) == pytest.approx(4.0)
+
+
+def test_slow_call_is_hedged():
+    governor = make_governor(1.0, 0, rate=0.001, burst=4)
+    governor.hedge_enabled = True
+    estimate = governor.latency["current.json"] = LatencyEstimate()
+    for _ in range(LATENCY_WARMUP_SAMPLES):
+        estimate.observe(0.01)
+    before = HEDGED.value("hedge")
+    response = asyncio.run(asyncio.wait_for(governor.get("current.json", {}), 0.5))
+    assert response.status_code == 200
+    assert governor.client.calls == 2
+    assert HEDGED.value("hedge") == before + 1
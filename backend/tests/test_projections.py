@@ -0,0 +1,18 @@
+from projections import FORECAST
+
+FORECAST_DATA = {
+    "location": {"name": "Pune", "region": "Maharashtra", "country": "India"},
+    "current": {"temp_c": 24.0, "condition": {"text": "Clear", "icon": "", "code": 1000}},
+    "forecast": {"forecastday": []},
+}
+
+
+def test_selection_without_hourly_data_accepts_hour_step():
+    project = FORECAST.select("current.temp_c")
+    assert project(FORECAST_DATA, hour_step=1) == {"current": {"temp_c": 24.0}}
+
+
+def test_selection_keeps_declared_step_defaults():
+    full = FORECAST.select(None)
+    selected = FORECAST.select("location.name")
+    assert selected.__kwdefaults__ == full.__kwdefaults__
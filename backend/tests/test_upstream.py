@@ -0,0 +1,43 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+# main reads its configuration at import time
+os.environ.setdefault("WEATHER_API_KEY", "test")
+os.environ.setdefault("HISTORY_ARCHIVE_ENABLED", "false")
+os.environ.setdefault("CACHE_SNAPSHOT_ENABLED", "false")
+os.environ.setdefault("PREFETCH_ENABLED", "false")
+
+from metrics import UPSTREAM_TIMEOUTS
+from upstream import UpstreamClient
+
+
+def timing_out_client(client: UpstreamClient) -> UpstreamClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    client._client = httpx.AsyncClient(
+        base_url=client.base_url, transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+def test_read_timeout_is_counted_and_reraised():
+    client = timing_out_client(UpstreamClient("http://upstream.test/v1", "key"))
+    before = UPSTREAM_TIMEOUTS.value("current.json")
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(client.get("current.json", {"q": "Pune"}))
+    assert UPSTREAM_TIMEOUTS.value("current.json") == before + 1
+
+
+def test_upstream_timeout_returns_504():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    timing_out_client(main.upstream)
+    response = TestClient(main.app).get("/weather/current", params={"city": "Timeoutville"})
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Weather service timeout"}
@@ -0,0 +1,91 @@
+"""Per-request phase timings for the Server-Timing header and sampled logs."""
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+logger = logging.getLogger("timing")
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+# Fraction of requests whose timings are logged as one JSON line (0 disables)
+TIMING_LOG_SAMPLE_RATE = float(os.getenv("TIMING_LOG_SAMPLE_RATE", 0.01))
+
+# Seconds spent in each phase by the current request
+_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar("phases", default=None)
+
+
+def add_phase(name: str, seconds: float):
+    """Add time to a phase of the current request (phases repeat, e.g. upstream)"""
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str):
+    """Time the enclosed block as part of ``name``"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(name, time.perf_counter() - start)
+
+
+def server_timing(phases: Dict[str, float], total: float) -> str:
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class TimingMiddleware:
+    """Collects phase timings for each HTTP request.
+
+    Phases recorded before the response starts are sent in a Server-Timing
+    header; a sample of requests is logged with the complete breakdown.
+    Work shared between coalesced requests is only timed for the request
+    that started it, and concurrent work (batch items) adds up, so a
+    phase can exceed the total.
+    """
+
+    def __init__(self, app, sample_rate: float = TIMING_LOG_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        phases: Dict[str, float] = {}
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    header = server_timing(phases, time.perf_counter() - start)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", header.encode("latin-1"))
+                    ]
+            await send(message)
+
+        token = _phases.set(phases)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _phases.reset(token)
+            if self.sample_rate > 0 and random.random() < self.sample_rate:
+                route = scope.get("route")
+                logger.info(json.dumps({
+                    "route": getattr(route, "path", "unmatched"),
+                    "method": scope["method"],
+                    "status": status,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                    "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in phases.items()},
+                }))
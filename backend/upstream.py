@@ -0,0 +1,102 @@
+"""Shared async HTTP client for WeatherAPI upstream calls."""
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from metrics import UPSTREAM_IN_FLIGHT, UPSTREAM_LATENCY, UPSTREAM_REQUESTS
+from metrics import UPSTREAM_TIMEOUTS as UPSTREAM_TIMEOUT_COUNT
+
+logger = logging.getLogger(__name__)
+
+# Connection pool configuration
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", 200))
+UPSTREAM_KEEPALIVE = int(os.getenv("UPSTREAM_KEEPALIVE", 50))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", 5))
+
+# Per-endpoint read timeouts (seconds)
+UPSTREAM_TIMEOUTS = {
+    "current.json": float(os.getenv("UPSTREAM_TIMEOUT_CURRENT", 10)),
+    "forecast.json": float(os.getenv("UPSTREAM_TIMEOUT_FORECAST", 15)),
+    "history.json": float(os.getenv("UPSTREAM_TIMEOUT_HISTORY", 10)),
+}
+DEFAULT_TIMEOUT = 10.0
+
+
+class UpstreamClient:
+    """Pooled keep-alive client shared by every /weather/* handler.
+
+    Created once at app startup and closed at shutdown, so connections
+    (and their TCP/TLS handshakes) are reused across requests.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str],
+        pool_size: int = UPSTREAM_POOL_SIZE,
+        keepalive: int = UPSTREAM_KEEPALIVE,
+        timeouts: Optional[Dict[str, float]] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.timeouts = dict(UPSTREAM_TIMEOUTS if timeouts is None else timeouts)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        """Open the connection pool"""
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.keepalive,
+            ),
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT),
+        )
+        logger.info(f"Upstream client started (pool size: {self.pool_size})")
+
+    async def close(self):
+        """Close the connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Upstream client closed")
+
+    def timeout_for(self, path: str, read: Optional[float] = None) -> httpx.Timeout:
+        return httpx.Timeout(
+            read if read is not None else self.timeouts.get(path, DEFAULT_TIMEOUT),
+            connect=UPSTREAM_CONNECT_TIMEOUT,
+        )
+
+    async def get(self, path: str, params: dict, timeout: Optional[float] = None) -> httpx.Response:
+        """GET an upstream endpoint (e.g. "current.json"); the API key is added here.
+
+        ``timeout`` overrides the endpoint's configured read timeout.
+        """
+        if self._client is None:
+            await self.start()
+        status = "error"
+        UPSTREAM_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            response = await self._client.get(
+                f"/{path}",
+                params={"key": self.api_key, **params},
+                timeout=self.timeout_for(path, timeout),
+            )
+            status = str(response.status_code)
+            return response
+        except httpx.TimeoutException:
+            status = "timeout"
+            UPSTREAM_TIMEOUT_COUNT.inc(path)
+            raise
+        finally:
+            UPSTREAM_IN_FLIGHT.dec()
+            UPSTREAM_LATENCY.observe(time.perf_counter() - start, path)
+            UPSTREAM_REQUESTS.inc(path, status)